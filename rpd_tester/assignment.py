@@ -0,0 +1,409 @@
+import math
+
+import numpy as np
+
+from rpd_tester.utils import compare_attributes, is_real_number, isclose_array
+
+# Score matrices with more rows or columns than this are matched greedily instead of optimally. hungarian() takes
+# about 0.13 s for a 100 x 100 matrix of tied scores at worst, and about 1.3 s at 300 x 300
+HUNGARIAN_MAX_SIZE = 100
+
+# Relative tolerance applied by compare_attributes to numeric attributes other than area
+NUMERIC_RELATIVE_TOLERANCE = 0.01
+
+# Absolute tolerance applied by compare_attributes to area
+AREA_ABSOLUTE_TOLERANCE = 0.1
+
+
+def isclose_matrix(target_values, candidate_values, relative_tolerance=1e-09, absolute_tolerance=0.0):
+    """Evaluates math.isclose() for every (target, candidate) pair of two arrays of numbers."""
+    return isclose_array(
+        target_values[:, None],
+        candidate_values[None, :],
+        relative_tolerance=relative_tolerance,
+        absolute_tolerance=absolute_tolerance,
+    )
+
+
+def score_attribute(generated_values, reference_values, attr, generated_zone_id, reference_zone_id):
+    """
+    Returns a matrix of compare_attributes() results for one attribute and every (generated, reference) pair.
+
+    The common cases (equal strings, numbers within tolerance, azimuths) are evaluated as whole arrays; any other
+    combination of value types is evaluated pair by pair with compare_attributes() itself.
+    """
+    scores = np.zeros((len(generated_values), len(reference_values)), dtype=np.int64)
+    rows = [i for i, target in enumerate(generated_values) if attr in target]
+    if not rows or not reference_values:
+        return scores
+
+    target_values = [generated_values[i].get(attr) for i in rows]
+    candidate_values = [candidate.get(attr) for candidate in reference_values]
+
+    if attr in ("azimuth", "area") or all(is_real_number(value) for value in target_values):
+        if all(is_real_number(value) for value in target_values + candidate_values):
+            targets = np.array(target_values, dtype=float)
+            candidates = np.array(candidate_values, dtype=float)
+
+            if attr == "azimuth":
+                # Walls seen from the zone on the other side face the opposite direction
+                target_origin = np.array(
+                    [generated_values[i].get("adjacent_zone") == generated_zone_id for i in rows]
+                )
+                candidate_origin = np.array(
+                    [candidate.get("adjacent_zone") == reference_zone_id for candidate in reference_values]
+                )
+                mismatched_origin = target_origin[:, None] != candidate_origin[None, :]
+                matched = np.where(
+                    mismatched_origin,
+                    np.abs(targets[:, None] - candidates[None, :]) == 180,
+                    targets[:, None] == candidates[None, :],
+                )
+            elif attr == "area":
+                matched = isclose_matrix(targets, candidates, absolute_tolerance=AREA_ABSOLUTE_TOLERANCE)
+            else:
+                matched = isclose_matrix(targets, candidates, relative_tolerance=NUMERIC_RELATIVE_TOLERANCE)
+
+            scores[rows] = matched
+            return scores
+
+    elif not any(isinstance(value, (list, int, float)) for value in target_values):
+        # Plain equality; values are compared through codes so that each pair is a single integer comparison
+        codes = {}
+        try:
+            target_codes = np.array([codes.setdefault(value, len(codes)) for value in target_values])
+        except TypeError:
+            target_codes = None
+
+        if target_codes is not None:
+            candidate_codes = np.array(
+                [codes.get(value, -1) if is_hashable(value) else -1 for value in candidate_values]
+            )
+            scores[rows] = target_codes[:, None] == candidate_codes[None, :]
+            return scores
+
+    for i in rows:
+        for j, candidate in enumerate(reference_values):
+            scores[i, j] = compare_attributes(
+                generated_values[i], candidate, attr, generated_zone_id, reference_zone_id
+            )
+    return scores
+
+
+def is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def build_score_matrix(generated_values, reference_values, attrs, generated_zone_id=None, reference_zone_id=None):
+    """
+    Builds the matrix of attribute match counts between generated and reference objects.
+
+    Returns
+    -------
+    numpy.ndarray: scores[i, j] is the number of attrs for which compare_attributes() matches
+    generated_values[i] with reference_values[j]
+    """
+    scores = np.zeros((len(generated_values), len(reference_values)), dtype=np.int64)
+    for attr in attrs:
+        scores += score_attribute(generated_values, reference_values, attr, generated_zone_id, reference_zone_id)
+    return scores
+
+
+def hungarian(cost):
+    """
+    Solves the rectangular assignment problem for a cost matrix with no more rows than columns,
+    using the shortest augmenting path form of the Hungarian algorithm.
+
+    Returns
+    -------
+    numpy.ndarray: the column assigned to each row, minimizing the total cost
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    # Row assigned to each column, 1-based with 0 for none; column 0 is a virtual starting column
+    assigned_row = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    # Row reduction: each row starts out assigned to its cheapest column if no earlier row took it, which keeps
+    # the duals feasible, so only the rows left over need an augmenting path
+    u[1:] = cost.min(axis=1)
+    for i, j in enumerate(cost.argmin(axis=1).tolist(), start=1):
+        if not assigned_row[j + 1]:
+            assigned_row[j + 1] = i
+    unassigned_rows = sorted(set(range(1, n + 1)) - set(assigned_row[1:].tolist()))
+
+    for i in unassigned_rows:
+        assigned_row[0] = i
+        j0 = 0
+        min_values = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+
+        while True:
+            used[j0] = True
+            i0 = assigned_row[j0]
+            free = ~used[1:]
+
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            improved = free & (reduced < min_values[1:])
+            min_values[1:][improved] = reduced[improved]
+            way[1:][improved] = j0
+
+            candidates = np.where(free, min_values[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            u[assigned_row[used]] += delta
+            v[used] -= delta
+            min_values[~used] -= delta
+
+            j0 = j1
+            if assigned_row[j0] == 0:
+                break
+
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            assigned_row[j0] = assigned_row[j1]
+            j0 = j1
+
+    assignment = np.zeros(n, dtype=np.int64)
+    for j in range(1, m + 1):
+        if assigned_row[j]:
+            assignment[assigned_row[j] - 1] = j - 1
+    return assignment
+
+
+def greedy_assignment(scores):
+    """
+    Assigns pairs in order of descending score, ties broken by generated and then reference position,
+    without reusing either side. Only nonzero scores are sorted; rows left over are paired with the
+    columns left over in order.
+
+    Returns
+    -------
+    dict: generated position -> reference position
+    """
+    assignment = {}
+    used_columns = set()
+
+    rows, columns = np.nonzero(scores)
+    order = np.lexsort((columns, rows, -scores[rows, columns]))
+    for i, j in zip(rows[order].tolist(), columns[order].tolist()):
+        if i not in assignment and j not in used_columns:
+            assignment[i] = j
+            used_columns.add(j)
+
+    free_columns = (j for j in range(scores.shape[1]) if j not in used_columns)
+    for i in range(scores.shape[0]):
+        if i not in assignment:
+            j = next(free_columns, None)
+            if j is None:
+                break
+            assignment[i] = j
+
+    return assignment
+
+
+def solve_assignment(scores, preferred_pairs=()):
+    """
+    Finds the one-to-one assignment of generated to reference objects with the highest total score.
+
+    Among assignments with the highest total score, the one keeping the most preferred (generated, reference)
+    pairs is chosen, so a good initial matching is only changed where that improves the total.
+    Matrices larger than HUNGARIAN_MAX_SIZE are assigned greedily.
+
+    Returns
+    -------
+    dict: generated position -> reference position, for min(rows, columns) generated objects
+    """
+    n, m = scores.shape
+    if n == 0 or m == 0:
+        return {}
+    if max(n, m) > HUNGARIAN_MAX_SIZE:
+        return greedy_assignment(scores)
+
+    # Scores dominate; each preferred pair only breaks ties between assignments with equal scores
+    weight = min(n, m) + 1
+    cost = -scores.astype(float) * weight
+    for i, j in preferred_pairs:
+        cost[i, j] -= 1
+
+    if n <= m:
+        return dict(enumerate(hungarian(cost).tolist()))
+
+    assignment = hungarian(cost.T).tolist()
+    return {i: j for j, i in enumerate(assignment)}
+
+
+def get_best_match_positions(scores, reference_ids):
+    """
+    For each generated object in turn, returns the position of the reference object with the highest score,
+    preferring the first one whose id has not been chosen yet when scores are tied, as get_best_match_attrs() does.
+    """
+    best_positions = []
+    used_reference_ids = set()
+
+    for row in scores:
+        if len(row) == 0:
+            best_positions.append(None)
+            continue
+
+        tied_positions = np.flatnonzero(row == row.max()).tolist()
+        best_position = next(
+            (j for j in tied_positions if reference_ids[j] not in used_reference_ids),
+            tied_positions[0],
+        )
+        best_positions.append(best_position)
+        used_reference_ids.add(reference_ids[best_position])
+
+    return best_positions
+
+
+def first_available(buckets, cursors, is_used):
+    """
+    Returns the smallest position in any of the sorted buckets for which is_used() is False, or None.
+
+    cursors keeps, for each bucket key, how many leading positions of the bucket are known to be used,
+    so is_used() must never become False again for a position once it is True.
+    """
+    first_position = None
+    for key, positions in buckets:
+        k = cursors.get(key, 0)
+        while k < len(positions) and is_used(positions[k]):
+            k += 1
+        cursors[key] = k
+        if k < len(positions) and (first_position is None or positions[k] < first_position):
+            first_position = positions[k]
+    return first_position
+
+
+class SurfaceBuckets:
+    """
+    Reference surfaces grouped by their exact area, by their exact azimuth and whether their adjacent_zone is the
+    reference zone, and by all three. The groups are themselves binned by area tolerance and by degree, so the
+    groups that can match a generated surface under compare_attributes() are found without scanning every surface.
+    """
+
+    def __init__(self, reference_values, reference_zone_id):
+        # Bucket key -> sorted positions of the reference surfaces in that bucket
+        self.buckets = {}
+        self.area_bins = {}
+        self.azimuth_bins = {}
+
+        for j, candidate in enumerate(reference_values):
+            area = candidate["area"]
+            azimuth_key = (candidate["azimuth"], candidate.get("adjacent_zone") == reference_zone_id)
+            self.buckets.setdefault(("area", area), []).append(j)
+            self.buckets.setdefault(("azimuth", *azimuth_key), []).append(j)
+            self.buckets.setdefault(("both", area, *azimuth_key), []).append(j)
+            self.area_bins.setdefault(math.floor(area / AREA_ABSOLUTE_TOLERANCE), set()).add(area)
+            self.azimuth_bins.setdefault(math.floor(azimuth_key[0]), set()).add(azimuth_key)
+
+    def get_matching_buckets(self, target, generated_zone_id):
+        """
+        Returns the buckets of reference surfaces matching both the area and azimuth of the target,
+        and the buckets matching either of them, as lists of (key, positions).
+        """
+        area = target["area"]
+        area_bin = math.floor(area / AREA_ABSOLUTE_TOLERANCE)
+        # Neighbouring bins are included so that values on either side of a bin edge are never missed
+        areas = [
+            candidate_area
+            for offset in range(-2, 3)
+            for candidate_area in self.area_bins.get(area_bin + offset, ())
+            if math.isclose(area, candidate_area, abs_tol=AREA_ABSOLUTE_TOLERANCE)
+        ]
+
+        azimuth = target["azimuth"]
+        origin = target.get("adjacent_zone") == generated_zone_id
+        azimuth_bin = math.floor(azimuth)
+        azimuth_keys = [
+            (candidate_azimuth, candidate_origin)
+            for facing in (-180, 0, 180)
+            for offset in (-1, 0, 1)
+            for candidate_azimuth, candidate_origin in self.azimuth_bins.get(azimuth_bin + facing + offset, ())
+            # Walls seen from the zone on the other side face the opposite direction
+            if (candidate_origin == origin and candidate_azimuth == azimuth)
+            or (candidate_origin != origin and abs(azimuth - candidate_azimuth) == 180)
+        ]
+
+        both_keys = [("both", candidate_area, *azimuth_key) for candidate_area in areas for azimuth_key in azimuth_keys]
+        either_keys = [("area", candidate_area) for candidate_area in areas] + [
+            ("azimuth", *azimuth_key) for azimuth_key in azimuth_keys
+        ]
+        return (
+            [(key, self.buckets[key]) for key in both_keys if key in self.buckets],
+            [(key, self.buckets[key]) for key in either_keys],
+        )
+
+
+def can_bucket_surfaces(generated_values, reference_values):
+    """Whether every surface has a plain numeric area and azimuth, as SurfaceBuckets requires."""
+    return all(
+        is_real_number(surface.get("area"))
+        and is_real_number(surface.get("azimuth"))
+        # The relative tolerance of math.isclose() only exceeds the absolute tolerance for very large areas
+        and abs(surface["area"]) * 1e-09 <= AREA_ABSOLUTE_TOLERANCE
+        for surface in [*generated_values, *reference_values]
+    )
+
+
+def match_surfaces_by_buckets(generated_values, reference_values, generated_zone_id, reference_zone_id):
+    """
+    Matches surfaces on area and azimuth through SurfaceBuckets, giving the same result as scoring every pair with
+    build_score_matrix() and then applying get_best_match_positions() and greedy_assignment() to the scores.
+
+    Returns
+    -------
+    tuple: (best match position for each generated surface, dict of generated position -> reference position)
+    """
+    surface_buckets = SurfaceBuckets(reference_values, reference_zone_id)
+    matching_buckets = [
+        surface_buckets.get_matching_buckets(target, generated_zone_id) for target in generated_values
+    ]
+    reference_ids = [candidate.get("id") for candidate in reference_values]
+
+    # Best match on its own: the first surface with the highest score whose id has not been chosen yet
+    best_positions = []
+    used_reference_ids = set()
+    id_cursors = {}
+    for both_buckets, either_buckets in matching_buckets:
+        if not reference_values:
+            best_positions.append(None)
+            continue
+
+        # With no surface scoring above zero, every surface is tied
+        tied_buckets = both_buckets or either_buckets or [("all", range(len(reference_values)))]
+
+        best_position = first_available(tied_buckets, id_cursors, lambda j: reference_ids[j] in used_reference_ids)
+        if best_position is None:
+            best_position = min(positions[0] for _, positions in tied_buckets)
+        best_positions.append(best_position)
+        used_reference_ids.add(reference_ids[best_position])
+
+    # Greedy one-to-one assignment: pairs matching both attributes, then pairs matching one, then the rest in order
+    assignment = {}
+    used_positions = set()
+    cursors = {}
+    for bucket_index in (0, 1):
+        for i, buckets in enumerate(matching_buckets):
+            if i not in assignment:
+                j = first_available(buckets[bucket_index], cursors, used_positions.__contains__)
+                if j is not None:
+                    assignment[i] = j
+                    used_positions.add(j)
+
+    free_positions = (j for j in range(len(reference_values)) if j not in used_positions)
+    for i in range(len(generated_values)):
+        if i not in assignment:
+            j = next(free_positions, None)
+            if j is None:
+                break
+            assignment[i] = j
+
+    return best_positions, assignment
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from rpd_tester.rpd_index import RPDIndex
+from rpd_tester.rpd_loader import SkippedArray, load_rpd
+
+# Name of the directory holding cached reference RPDs, created next to the reference_rpds directory
+CACHE_DIR_NAME = ".rpd_cache"
+
+# Subdirectory of the cache directory holding the cached object maps of each test case
+OBJECT_MAP_CACHE_DIR_NAME = "object_maps"
+
+# Numeric arrays at least this long, such as hourly schedule values, are never read by the object mapping
+MAPPING_IGNORED_ARRAY_MIN_LENGTH = 24
+
+
+@lru_cache(maxsize=None)
+def get_tool_fingerprint():
+    """Returns a hash of the rpd_tester sources and Python version, so cached data is rebuilt when either changes."""
+    digest = hashlib.sha256(repr(sys.version_info[:2]).encode())
+    for source_file in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        digest.update(source_file.name.encode())
+        digest.update(source_file.read_bytes())
+    return digest.hexdigest()
+
+
+def get_cache_key(file_bytes, required_keys):
+    """Returns the key of a cached RPD from its file content, the keys it was loaded with and the tool fingerprint."""
+    digest = hashlib.sha256(file_bytes)
+    digest.update(repr(sorted(required_keys) if required_keys is not None else None).encode())
+    digest.update(get_tool_fingerprint().encode())
+    return digest.hexdigest()
+
+
+def write_cache_file(cache_file, stem, data):
+    """Pickles data to a cache file, replacing the cache files of earlier versions with the same stem."""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Any cached copy of an earlier version of the file is now stale
+        for stale_file in cache_file.parent.glob(f"{stem}.*.pickle"):
+            stale_file.unlink(missing_ok=True)
+
+        # Write to a temporary file first so that concurrent runs never read a partial cache file
+        file_descriptor, temp_file = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as file:
+            pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        # The cache is an optimization only
+        pass
+
+
+def read_cache_file(cache_file):
+    """Returns the unpickled content of a cache file, or None if it does not exist or cannot be read."""
+    if not cache_file.is_file():
+        return None
+    try:
+        with open(cache_file, "rb") as file:
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        # Unreadable cache files are rebuilt
+        return None
+
+
+def is_ignored_by_mapping(value):
+    """Returns whether a value is a large numeric array, which no object matcher reads."""
+    return isinstance(value, SkippedArray) or (
+        isinstance(value, list)
+        and len(value) >= MAPPING_IGNORED_ARRAY_MIN_LENGTH
+        and all(isinstance(item, (int, float)) for item in value)
+    )
+
+
+def get_mapping_projection(value):
+    """Returns a copy of an RPD without the values that no object matcher reads."""
+    if isinstance(value, dict):
+        return {
+            key: get_mapping_projection(item) for key, item in value.items() if not is_ignored_by_mapping(item)
+        }
+    if isinstance(value, list):
+        return [get_mapping_projection(item) for item in value]
+    return value
+
+
+def get_object_map_cache_key(generated_json, reference_file_bytes):
+    """
+    Returns the key of a cached object map from the parts of the generated RPD that the object matchers read,
+    the reference RPD file content and the tool fingerprint.
+    """
+    digest = hashlib.sha256(json.dumps(get_mapping_projection(generated_json), separators=(",", ":")).encode())
+    digest.update(hashlib.sha256(reference_file_bytes).digest())
+    digest.update(get_tool_fingerprint().encode())
+    return digest.hexdigest()
+
+
+def get_fingerprint(inputs):
+    """Returns a hash of the inputs of a unit of mapping work, ignoring the values that no object matcher reads."""
+    return hashlib.sha256(json.dumps(get_mapping_projection(inputs), separators=(",", ":")).encode()).hexdigest()
+
+
+class UnitCache:
+    """
+    Results of units of mapping work, such as the surfaces of one zone, kept with the fingerprint of their inputs.
+    A unit is only reused while the fingerprint of its inputs is unchanged.
+    """
+
+    def __init__(self, units=None):
+        # Unit key -> (fingerprint, result)
+        self.units = units if units is not None else {}
+        # Unit key -> (fingerprint, result) of the units built since the cache was loaded
+        self.new_units = {}
+        # Keys of the units reused or built since the cache was loaded
+        self.used_unit_keys = set()
+
+    def get_unit(self, unit_key, fingerprint):
+        """Returns the result of a unit built from inputs with the given fingerprint, or None."""
+        stored_fingerprint, result = self.units.get(unit_key, (None, None))
+        if stored_fingerprint != fingerprint:
+            return None
+        self.used_unit_keys.add(unit_key)
+        return result
+
+    def put_unit(self, unit_key, fingerprint, result):
+        self.used_unit_keys.add(unit_key)
+        if self.units.get(unit_key, (None,))[0] != fingerprint:
+            self.units[unit_key] = self.new_units[unit_key] = (fingerprint, result)
+
+
+class ObjectMapCache(UnitCache):
+    """
+    Maps of the object families of a test case, kept on disk between runs.
+
+    Each entry holds the map, errors and printed output of building one family's map, so a rerun with an
+    unchanged model reproduces the same results without mapping anything.
+
+    The results of smaller units of mapping work are also kept. When the model has changed, they are carried over
+    from the most recent cache file of the test case, so only the units whose inputs changed are mapped again.
+    Units that a run neither reuses nor builds are dropped when it saves the cache, along with the cache files of
+    earlier versions of the model.
+    """
+
+    def __init__(self, cache_file, stem):
+        self.cache_file = cache_file
+        self.stem = stem
+        self.changed = False
+        # Families whose maps were built, rather than read from the entries, since the cache was loaded
+        self.built_families = set()
+
+        data = read_cache_file(cache_file)
+        if data is None:
+            data = self.read_previous_data()
+            self.entries = {}
+        else:
+            self.entries = data["families"]
+        super().__init__(data["units"] if data is not None else {})
+
+    def read_previous_data(self):
+        """Returns the content of the most recent cache file of the test case, if it was written by this tool."""
+        previous_files = sorted(
+            self.cache_file.parent.glob(f"{self.stem}.*.pickle"), key=lambda file: file.stat().st_mtime
+        )
+        data = read_cache_file(previous_files[-1]) if previous_files else None
+        if isinstance(data, dict) and data.get("tool") == get_tool_fingerprint():
+            return data
+        return None
+
+    def get(self, family):
+        return self.entries.get(family)
+
+    def put(self, family, entry):
+        self.entries[family] = entry
+        self.built_families.add(family)
+        self.changed = True
+
+    def get_units(self, prefix):
+        """Returns a UnitCache of the units whose keys start with prefix, such as a family and a pair of RMDs."""
+        return UnitCache({unit_key: unit for unit_key, unit in self.units.items() if unit_key[:len(prefix)] == prefix})
+
+    def add_units(self, new_units, used_unit_keys):
+        """Adds the units built and the keys of the units used by a UnitCache, e.g. one sent to a worker process."""
+        for unit_key, (fingerprint, result) in new_units.items():
+            self.put_unit(unit_key, fingerprint, result)
+        self.used_unit_keys.update(used_unit_keys)
+
+    def save(self):
+        """Writes the entries, and the units used to build them, to disk if any were added since they were loaded."""
+        if self.changed:
+            # Units of the families read from the entries are kept, as the entries were built from them
+            kept_families = set(self.entries) - self.built_families
+            self.units = {
+                unit_key: unit
+                for unit_key, unit in self.units.items()
+                if unit_key in self.used_unit_keys or unit_key[0] in kept_families
+            }
+            data = {"tool": get_tool_fingerprint(), "families": self.entries, "units": self.units}
+            write_cache_file(self.cache_file, self.stem, data)
+            self.changed = False
+
+
+def load_object_map_cache(test, generated_json, reference_json_file, cache_dir):
+    """Returns the ObjectMapCache of a test case for the given generated RPD and reference RPD file."""
+    cache_key = get_object_map_cache_key(generated_json, Path(reference_json_file).read_bytes())
+    return ObjectMapCache(Path(cache_dir) / OBJECT_MAP_CACHE_DIR_NAME / f"{test}.{cache_key[:32]}.pickle", test)
+
+
+def get_cached_rpd_file(file_path, required_keys, cache_dir):
+    """Returns the path of the cached copy of an RPD file loaded with the given keys."""
+    file_path = Path(file_path)
+    cache_key = get_cache_key(file_path.read_bytes(), required_keys)
+    return Path(cache_dir) / f"{file_path.stem}.{cache_key[:32]}.pickle"
+
+
+def load_cached_rpd(file_path, required_keys, cache_dir):
+    """
+    Loads an RPD and its RPDIndex, reusing the pickled copy in cache_dir when the file has not changed.
+    A newly parsed RPD is only written to the cache by save_cached_rpd().
+
+    Parameters
+    ----------
+    file_path: Path
+    Path of the RPD file
+    required_keys: set | None
+    Names of the keys whose arrays must be parsed, passed to load_rpd()
+    cache_dir: Path
+    Directory holding the cached RPDs; it is created if it does not exist
+
+    Returns
+    -------
+    tuple: (rpd, RPDIndex of the rpd)
+    """
+    rpd_index = read_cache_file(get_cached_rpd_file(file_path, required_keys, cache_dir))
+    if rpd_index is None:
+        rpd_index = RPDIndex(load_rpd(file_path, required_keys))
+        rpd_index.changed = True
+
+    return rpd_index.rpd, rpd_index
+
+
+def save_cached_rpd(rpd_index, file_path, required_keys, cache_dir):
+    """
+    Writes an RPDIndex loaded by load_cached_rpd() to the cache if it was newly parsed, or if it has computed
+    state that is kept with it, such as schedule fingerprints, since it was loaded.
+    """
+    if rpd_index.changed:
+        write_cache_file(get_cached_rpd_file(file_path, required_keys, cache_dir), Path(file_path).stem, rpd_index)
+        rpd_index.changed = False
@@ -1,4 +1,23 @@
+import io
+import sys
+from collections import deque
+from contextlib import redirect_stdout
+from typing import NamedTuple
+
 from rpd_tester.utils import *
+from rpd_tester.rpd_index import RPDIndex, SurfaceGraph
+from rpd_tester.cache import get_fingerprint
+from rpd_tester.name_matcher import NameMatcher
+from rpd_tester.path_engine import compile_checks_predicate
+from rpd_tester.assignment import (
+    HUNGARIAN_MAX_SIZE,
+    build_score_matrix,
+    can_bucket_surfaces,
+    get_best_match_positions,
+    greedy_assignment,
+    match_surfaces_by_buckets,
+    solve_assignment,
+)
 
 
 def get_mapping(
@@ -183,11 +202,29 @@ def define_materials_map(generated_json, reference_json, object_id_map):
     return materials_map, errors
 
 
-def define_surface_map(generated_zone, reference_zone, generated_json, reference_json):
+def define_surface_map(
+    generated_zone,
+    reference_zone,
+    generated_json,
+    reference_json,
+    generated_index=None,
+    reference_index=None,
+    generated_graph=None,
+    reference_graph=None,
+):
     generated_zone_id = generated_zone["id"]
     reference_zone_id = reference_zone["id"]
     surface_map = {}
 
+    if generated_graph is None:
+        if generated_index is None:
+            generated_index = RPDIndex(generated_json)
+        generated_graph = generated_index.surface_graph
+    if reference_graph is None:
+        if reference_index is None:
+            reference_index = RPDIndex(reference_json)
+        reference_graph = reference_index.surface_graph
+
     surface_types = [
         ("Exterior Wall", {"classification": "WALL", "adjacent_to": "EXTERIOR"}),
         ("Interior Wall", {"classification": "WALL", "adjacent_to": "INTERIOR"}),
@@ -196,31 +233,18 @@ def define_surface_map(generated_zone, reference_zone, generated_json, reference
     ]
 
     for surface_type, filters in surface_types:
-        generated_surfaces = find_all_with_filters(
-            "$.surfaces[*]", filters, generated_zone
-        )
-        reference_surfaces = find_all_with_filters(
-            "$.surfaces[*]", filters, reference_zone
-        )
+        matches_type = compile_checks_predicate(list(filters.items()))
+        generated_surfaces = [
+            surface for surface in generated_graph.owned_surfaces.get(generated_zone_id, []) if matches_type(surface)
+        ]
+        reference_surfaces = [
+            surface for surface in reference_graph.owned_surfaces.get(reference_zone_id, []) if matches_type(surface)
+        ]
 
         if surface_type == "Interior Wall":
             # Extend with surfaces from other zones where this zone is the adjacent_zone
-            generated_surfaces.extend(
-                find_all_with_field_value(
-                    "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[*]",
-                    "adjacent_zone",
-                    generated_zone_id,
-                    generated_json,
-                )
-            )
-            reference_surfaces.extend(
-                find_all_with_field_value(
-                    "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[*]",
-                    "adjacent_zone",
-                    reference_zone_id,
-                    reference_json,
-                )
-            )
+            generated_surfaces.extend(generated_graph.adjacent_surfaces.get(generated_zone_id, []))
+            reference_surfaces.extend(reference_graph.adjacent_surfaces.get(reference_zone_id, []))
 
         local_surface_map = define_local_surface_map(
             generated_zone_id,
@@ -527,104 +551,661 @@ def define_pump_map(generated_json, reference_json, object_id_map):
     return pump_map, errors
 
 
-def map_objects(generated_json, reference_json):
-    warnings = []
-    errors = []
+class MappingFamily(NamedTuple):
+    """An object family whose map is built within each pair of RMDs by the RMDMapper.map_<family>() method."""
+    # RPD collections holding the objects of this family
+    collections: tuple
+    # Families whose maps the matchers of this family look up
+    dependencies: tuple = ()
+    # Keys of an RMD that the matchers of this family read, which is all of it a worker process is sent
+    rmd_keys: tuple = ()
+
+
+# Object families in the order their maps are built
+MAPPING_FAMILIES = {
+    "zones": MappingFamily(("zones",), rmd_keys=("buildings",)),
+    "hvac": MappingFamily(("heating_ventilating_air_conditioning_systems",), ("zones",), ("buildings",)),
+    "surfaces": MappingFamily(("surfaces",), ("zones",), ("buildings",)),
+    "terminals": MappingFamily(("terminals",), ("zones", "hvac"), ("buildings",)),
+    "constructions": MappingFamily(("constructions",), rmd_keys=("buildings", "constructions")),
+    "materials": MappingFamily(("materials",), rmd_keys=("materials", "constructions")),
+    "boilers": MappingFamily(("boilers",), rmd_keys=("boilers",)),
+    "chillers": MappingFamily(("chillers",), rmd_keys=("chillers",)),
+    "heat_rejections": MappingFamily(("heat_rejections",), rmd_keys=("heat_rejections",)),
+    "loops": MappingFamily(("fluid_loops", "child_loops"), rmd_keys=("fluid_loops",)),
+    "pumps": MappingFamily(("pumps",), ("loops",), ("pumps",)),
+}
+
+# RPD collection -> family of the objects held in it
+COLLECTION_FAMILIES = {
+    collection: family
+    for family, mapping_family in MAPPING_FAMILIES.items()
+    for collection in mapping_family.collections
+}
+
+
+class OnDemandMap(dict):
+    """Map of generated object ids to reference object ids, which resolves an id that is not mapped yet on lookup."""
+
+    def resolve(self, key):
+        """Builds the maps of the families of the generated objects with the given id."""
+
+    def __contains__(self, key):
+        if not dict.__contains__(self, key):
+            self.resolve(key)
+        return dict.__contains__(self, key)
+
+    def __getitem__(self, key):
+        if not dict.__contains__(self, key):
+            self.resolve(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if not dict.__contains__(self, key):
+            self.resolve(key)
+        return dict.get(self, key, default)
+
+
+class RMDObjectMap(OnDemandMap):
+    """
+    Map of generated object ids to reference object ids within one pair of RMDs, which the matchers of that pair
+    look up. Ids are only unique within an RMD, so each pair keeps its own map.
+    """
 
-    generated_zones = get_zones_from_json(generated_json)
-    reference_zones = get_zones_from_json(reference_json)
+    def __init__(self, object_id_map=None):
+        super().__init__()
+        # ObjectMap of the whole RPDs, which builds the maps of any family that is not mapped yet
+        self.object_id_map = object_id_map
 
-    # Define a map for Zones. ! Maps for other objects will depend on this map !
-    object_id_map = get_mapping("Zones", generated_zones, reference_zones)
+    def resolve(self, key):
+        if self.object_id_map is not None:
+            self.object_id_map.resolve(key)
 
-    if len(object_id_map) != len(reference_zones):
-        errors.append(
-            f"""Could not match zones between the generated and reference files. Try to better align your modeled zone names with the correct answer file's zone naming conventions.\n{chr(10).join(f"- {zone['id']}" for zone in reference_zones)}"""
-        )  # chr(10) is a newline character
-        # Return early if zones could not be matched
-        return object_id_map, warnings, errors
-
-    # Define maps for HVAC systems
-    hvac_map, hvac_map_errors = define_hvac_map(
-        generated_json, reference_json, object_id_map
-    )
-    object_id_map.update(hvac_map)
-    errors.extend(hvac_map_errors)
 
-    reference_zone_ids = [zone["id"] for zone in reference_zones]
+class ObjectMap(OnDemandMap):
+    """
+    Map of generated object ids to reference object ids, built one object family at a time.
+
+    The zone map is built up front. The map of any other family is built, after the maps it relies on, the first
+    time it is required or an id of that family is looked up, so a test case only pays for the families it uses.
+    Errors from building each family's map are collected in errors.
 
-    for i, generated_zone in enumerate(generated_zones):
-        generated_zone_id = generated_zone["id"]
-        reference_zone_id = object_id_map[generated_zone_id]
-        reference_zone = reference_zones[reference_zone_ids.index(reference_zone_id)]
+    Maps are built hierarchically: RMDs are paired first, then the buildings and building segments within each
+    pair of RMDs, and zones are only matched against the zones of their mapped segment. Every other family is
+    matched within each pair of RMDs, or within each pair of zones for surfaces and terminals. Each pair of RMDs
+    is mapped by an RMDMapper and keeps its own map in rmd_maps; where pairs of RMDs map the same id, this map
+    holds the first pair's match.
+    """
 
-        # Define maps for surfaces
-        surface_map = define_surface_map(
-            generated_zone, reference_zone, generated_json, reference_json
+    def __init__(
+        self, generated_json, reference_json, generated_index, reference_index, executor=None, map_cache=None
+    ):
+        super().__init__()
+        self.generated_json = generated_json
+        self.reference_json = reference_json
+        self.generated_index = generated_index
+        self.reference_index = reference_index
+        # Executor used to build the maps of families and RMDs that do not rely on each other concurrently
+        self.executor = executor
+        # Cache of the family maps built by an earlier run with the same RPDs, e.g. an ObjectMapCache
+        self.map_cache = map_cache
+        self.mapped_families = set()
+        self.errors = []
+        # Set when the zones could not be matched, as no other family can be mapped then
+        self.closed = False
+
+        self.generated_zones = get_zones_from_json(generated_json)
+        self.reference_zones = get_zones_from_json(reference_json)
+
+        rmd_pairs = match_containers(
+            generated_json.get("ruleset_model_descriptions", []),
+            reference_json.get("ruleset_model_descriptions", []),
         )
-        object_id_map.update(surface_map)
+        # The indexes of the whole RPDs hold the same zones as a single pair of RMDs, and their SurfaceGraphs are
+        # reused by the comparisons
+        rpd_indexes = None
+        if all(len(rpd.get("ruleset_model_descriptions", [])) == 1 for rpd in (generated_json, reference_json)):
+            rpd_indexes = (generated_index, reference_index)
+        self.rmd_maps = [RMDObjectMap(self) for _ in rmd_pairs]
+        self.rmd_mappers = [
+            RMDMapper(generated_rmd, reference_rmd, rmd_map, map_cache, rpd_indexes)
+            for (generated_rmd, reference_rmd), rmd_map in zip(rmd_pairs, self.rmd_maps)
+        ]
+        # Family -> its map within each pair of RMDs
+        self.rmd_family_maps = {}
+
+    def require(self, families):
+        """
+        Builds the maps of the given families and the families they rely on, in the order of MAPPING_FAMILIES.
+
+        With an executor, the families are built in waves: every family whose maps it relies on are built is
+        submitted at once, one task per pair of RMDs, unless the wave holds a single task, which is built here.
+        The maps, errors and printed output of each wave are merged in the order of MAPPING_FAMILIES and of the
+        RMDs, so the result is the same as building them one at a time.
+        """
+        required_families = set()
+        pending_families = list(families)
+        while pending_families:
+            family = pending_families.pop()
+            if family not in required_families:
+                required_families.add(family)
+                pending_families.extend(MAPPING_FAMILIES[family].dependencies)
+
+        unmapped_families = [
+            family for family in MAPPING_FAMILIES
+            if family in required_families and family not in self.mapped_families
+        ]
 
-        # Define maps for terminals
-        terminal_map, terminal_map_errors = define_terminal_map(
-            object_id_map,
-            generated_zone,
-            reference_zone,
+        # The zone map decides whether any other family can be mapped, so it is always built first
+        if "zones" in unmapped_families:
+            unmapped_families.remove("zones")
+            self.map_family("zones")
+
+        if self.executor is None or len(unmapped_families) * len(self.rmd_mappers) < 2:
+            for family in unmapped_families:
+                self.map_family(family)
+            return
+
+        results = {}
+        while unmapped_families and not self.closed:
+            wave = [
+                family for family in unmapped_families
+                if all(dependency in self.mapped_families for dependency in MAPPING_FAMILIES[family].dependencies)
+            ]
+            unmapped_families = [family for family in unmapped_families if family not in wave]
+            self.mapped_families.update(wave)
+
+            built_families = [family for family in wave if self.get_cached_result(family) is None]
+            futures = {}
+            if len(built_families) * len(self.rmd_mappers) >= 2:
+                futures = {
+                    family: [
+                        self.executor.submit(map_family_in_worker, self.get_worker_mapper(family, position), family)
+                        for position in range(len(self.rmd_mappers))
+                    ]
+                    for family in built_families
+                }
+            for family in wave:
+                if family in futures:
+                    rmd_family_maps, family_errors, outputs = [], [], []
+                    for future in futures[family]:
+                        rmd_family_map, rmd_errors, output, new_units, used_unit_keys = future.result()
+                        rmd_family_maps.append(rmd_family_map)
+                        family_errors.extend(rmd_errors)
+                        outputs.append(output)
+                        if self.map_cache is not None:
+                            self.map_cache.add_units(new_units, used_unit_keys)
+                    results[family] = (rmd_family_maps, family_errors, "".join(outputs))
+                    self.put_cached_result(family, results[family])
+                else:
+                    results[family] = self.build_family(family)
+                self.add_rmd_family_maps(family, results[family][0])
+
+        for family in MAPPING_FAMILIES:
+            if family in results:
+                _, family_errors, output = results[family]
+                sys.stdout.write(output)
+                self.errors.extend(family_errors)
+
+    def map_family(self, family):
+        """Builds the map of a single family, whose dependencies must already be mapped."""
+        if self.closed:
+            return
+        # Mark the family first, as building its map may look up ids of the same family
+        self.mapped_families.add(family)
+
+        rmd_family_maps, family_errors, output = self.build_family(family)
+        sys.stdout.write(output)
+        self.add_rmd_family_maps(family, rmd_family_maps)
+        self.errors.extend(family_errors)
+        if family == "zones" and family_errors:
+            # No other objects can be mapped if the zones could not be matched
+            self.closed = True
+
+    def build_family(self, family):
+        """
+        Returns the (map of each pair of RMDs, errors, printed output) of a family from the map cache, or built in
+        this process without printing its output.
+        """
+        result = self.get_cached_result(family)
+        if result is None:
+            output = io.StringIO()
+            with redirect_stdout(output):
+                if family == "zones":
+                    rmd_family_maps, family_errors = self.map_zones()
+                else:
+                    rmd_family_maps, family_errors = [], []
+                    for rmd_mapper in self.rmd_mappers:
+                        rmd_family_map, rmd_errors = getattr(rmd_mapper, f"map_{family}")()
+                        rmd_family_maps.append(rmd_family_map)
+                        family_errors.extend(rmd_errors)
+            result = (rmd_family_maps, family_errors, output.getvalue())
+            self.put_cached_result(family, result)
+        return result
+
+    def add_rmd_family_maps(self, family, rmd_family_maps):
+        """Adds the map of a family within each pair of RMDs to the maps of the pairs and to this map."""
+        self.rmd_family_maps[family] = rmd_family_maps
+        family_map = {}
+        # The first pair of RMDs to map an id keeps it in this map
+        for rmd_map, rmd_family_map in reversed(list(zip(self.rmd_maps, rmd_family_maps))):
+            dict.update(rmd_map, rmd_family_map)
+            family_map.update(rmd_family_map)
+        dict.update(self, family_map)
+
+    def get_cached_result(self, family):
+        """Returns the (map of each pair of RMDs, errors, printed output) of a family from the map cache, or None."""
+        return self.map_cache.get(family) if self.map_cache is not None else None
+
+    def put_cached_result(self, family, result):
+        if self.map_cache is not None:
+            self.map_cache.put(family, result)
+
+    def get_worker_mapper(self, family, position):
+        """
+        Returns an RMDMapper that builds the map of a family within a pair of RMDs in a worker process.
+
+        It is sent only the keys of the RMDs the family reads, the maps of the families it relies on and the cached
+        units of the family, rather than the whole RPDs, their indexes and the map cache.
+        """
+        rmd_mapper = self.rmd_mappers[position]
+        mapping_family = MAPPING_FAMILIES[family]
+        rmd_keys = {"id", *mapping_family.rmd_keys}
+        rmd_map = RMDObjectMap()
+        for dependency in MAPPING_FAMILIES:
+            if dependency in mapping_family.dependencies:
+                dict.update(rmd_map, self.rmd_family_maps[dependency][position])
+
+        unit_cache = None
+        if self.map_cache is not None:
+            unit_cache = self.map_cache.get_units((family, *rmd_mapper.get_rmd_ids()))
+        return RMDMapper(
+            *(
+                {key: value for key, value in view["ruleset_model_descriptions"][0].items() if key in rmd_keys}
+                for view in (rmd_mapper.generated_view, rmd_mapper.reference_view)
+            ),
+            rmd_map,
+            unit_cache,
         )
-        object_id_map.update(terminal_map)
-        errors.extend(terminal_map_errors)
 
-    construction_map, construction_map_errors = define_construction_map(
-        generated_json, reference_json, object_id_map
-    )
-    object_id_map.update(construction_map)
-    errors.extend(construction_map_errors)
+    def map_all(self):
+        """Builds the maps of every family."""
+        self.require(MAPPING_FAMILIES)
 
-    materials_map, materials_map_errors = define_materials_map(
-        generated_json, reference_json, object_id_map
-    )
-    object_id_map.update(materials_map)
-    errors.extend(materials_map_errors)
+    def resolve(self, key):
+        if self.closed or not isinstance(key, str):
+            return
+        families = {
+            COLLECTION_FAMILIES.get(entry.collection)
+            for entry in self.generated_index.objects.get(key, ())
+        }
+        families.discard(None)
+        if not families <= self.mapped_families:
+            self.require(families)
 
-    boiler_map, boiler_map_errors = define_boiler_map(
-        generated_json, reference_json, object_id_map
-    )
-    object_id_map.update(boiler_map)
-    errors.extend(boiler_map_errors)
+    def map_zones(self):
+        # Define a map for Zones. ! Maps for other objects will depend on this map !
+        rmd_zone_maps = [rmd_mapper.map_zones() for rmd_mapper in self.rmd_mappers]
 
-    chiller_map, chiller_map_errors = define_chiller_map(
-        generated_json, reference_json, object_id_map
-    )
-    object_id_map.update(chiller_map)
-    errors.extend(chiller_map_errors)
+        errors = []
+        # Zone ids are only unique within an RMD, so the zones mapped within each pair of RMDs are counted
+        if sum(len(zone_map) for zone_map in rmd_zone_maps) != len(self.reference_zones):
+            errors.append(
+                f"""Could not match zones between the generated and reference files. Try to better align your modeled zone names with the correct answer file's zone naming conventions.\n{chr(10).join(f"- {zone['id']}" for zone in self.reference_zones)}"""
+            )  # chr(10) is a newline character
 
-    heat_rejection_map, heat_rejection_map_errors = define_heat_rejection_map(
-        generated_json, reference_json, object_id_map
-    )
-    object_id_map.update(heat_rejection_map)
-    errors.extend(heat_rejection_map_errors)
+        return rmd_zone_maps, errors
 
-    loop_map, loop_map_errors = define_loop_map(
-        generated_json, reference_json, object_id_map
-    )
-    object_id_map.update(loop_map)
-    errors.extend(loop_map_errors)
 
-    pump_map, pump_map_errors = define_pump_map(
-        generated_json, reference_json, object_id_map
+class RMDMapper:
+    """
+    Builds the map of each family within a pair of RMDs, looking up the maps of other families in rmd_map.
+
+    A mapper only reads its pair of RMDs, rmd_map and map_cache, so a copy holding only what one family reads can
+    build that family's map in a worker process.
+    """
+
+    def __init__(self, generated_rmd, reference_rmd, rmd_map, map_cache=None, rpd_indexes=None):
+        # The pair of RMDs, as RPDs holding only that RMD so that the define_*_map functions can be reused
+        self.generated_view = {"ruleset_model_descriptions": [generated_rmd]}
+        self.reference_view = {"ruleset_model_descriptions": [reference_rmd]}
+        self.rmd_map = rmd_map
+        # Cache of the units of mapping work built by an earlier run, e.g. an ObjectMapCache or a UnitCache
+        self.map_cache = map_cache
+        # (generated, reference) RPDIndex of RPDs holding only this pair of RMDs, whose SurfaceGraphs are reused
+        self.rpd_indexes = rpd_indexes
+        self.surface_graphs = None
+
+    def get_rmd_ids(self):
+        """Returns the ids of the generated and reference RMDs."""
+        return (
+            self.generated_view["ruleset_model_descriptions"][0].get("id"),
+            self.reference_view["ruleset_model_descriptions"][0].get("id"),
+        )
+
+    def iter_mapped_zones(self):
+        """Yields each mapped generated zone with the reference zone it is mapped to."""
+        reference_zones_by_id = {}
+        for reference_zone in get_zones_from_json(self.reference_view):
+            reference_zones_by_id.setdefault(reference_zone["id"], reference_zone)
+
+        for generated_zone in get_zones_from_json(self.generated_view):
+            reference_zone = reference_zones_by_id.get(self.rmd_map.get(generated_zone["id"]))
+            if reference_zone is not None:
+                yield generated_zone, reference_zone
+
+    def get_surface_graphs(self):
+        """Returns the generated and reference SurfaceGraphs of the zones of the pair of RMDs."""
+        if self.surface_graphs is None:
+            if self.rpd_indexes is not None:
+                self.surface_graphs = tuple(rpd_index.surface_graph for rpd_index in self.rpd_indexes)
+            else:
+                self.surface_graphs = tuple(
+                    SurfaceGraph(get_zones_from_json(view)) for view in (self.generated_view, self.reference_view)
+                )
+        return self.surface_graphs
+
+    def build_unit(self, unit_key, inputs, build):
+        """
+        Returns the (map, errors) of a unit of mapping work from build(), or from the map cache when an earlier run
+        built the same unit from inputs with the same fingerprint.
+
+        The inputs must include everything the unit's matcher reads, including the maps of other families.
+        Unit keys start with the family and the ids of the pair of RMDs, as other ids are only unique within an RMD.
+        """
+        if self.map_cache is None:
+            return build()
+
+        fingerprint = get_fingerprint(inputs)
+        result = self.map_cache.get_unit(unit_key, fingerprint)
+        if result is None:
+            output = io.StringIO()
+            with redirect_stdout(output):
+                unit_map, unit_errors = build()
+            result = (unit_map, unit_errors, output.getvalue())
+            self.map_cache.put_unit(unit_key, fingerprint, result)
+
+        unit_map, unit_errors, output = result
+        sys.stdout.write(output)
+        return unit_map, unit_errors
+
+    def build_rmd_unit(self, family, inputs, define_map):
+        """Returns the (map, errors) of a family within the pair of RMDs, from define_map() or the map cache."""
+        return self.build_unit(
+            (family, *self.get_rmd_ids()),
+            inputs,
+            lambda: define_map(self.generated_view, self.reference_view, self.rmd_map),
+        )
+
+    def get_collection_inputs(self, jpath, dependency_key=None):
+        """
+        Returns the generated and reference objects at a path within the pair of RMDs, and the mapped ids that the
+        generated objects reference by a key.
+        """
+        generated_values = find_all(jpath, self.generated_view)
+        reference_values = find_all(jpath, self.reference_view)
+        if dependency_key is None:
+            return [generated_values, reference_values]
+        dependency_map = {
+            value[dependency_key]: self.rmd_map.get(value[dependency_key])
+            for value in generated_values if isinstance(value.get(dependency_key), str)
+        }
+        return [generated_values, reference_values, dependency_map]
+
+    def map_zones(self):
+        """
+        Matches the zones of the pair of RMDs within their mapped building segments.
+
+        The zones of a generated segment that could not be paired are matched against the zones of the mapped
+        building that are still unmatched, and the zones of a generated building that could not be paired against
+        the zones of the RMD that are still unmatched.
+        """
+        generated_rmd = self.generated_view["ruleset_model_descriptions"][0]
+        reference_rmd = self.reference_view["ruleset_model_descriptions"][0]
+        rmd_key = ("zones", *self.get_rmd_ids())
+        zone_map = {}
+
+        building_pairs = match_containers(generated_rmd.get("buildings", []), reference_rmd.get("buildings", []))
+        for generated_building, reference_building in building_pairs:
+            building_key = (*rmd_key, generated_building.get("id"), reference_building.get("id"))
+            segment_pairs = match_containers(
+                generated_building.get("building_segments", []), reference_building.get("building_segments", [])
+            )
+            for generated_segment, reference_segment in segment_pairs:
+                zone_map.update(
+                    self.build_zone_unit(
+                        (*building_key, generated_segment.get("id"), reference_segment.get("id")),
+                        find_all("$.zones[*]", generated_segment),
+                        find_all("$.zones[*]", reference_segment),
+                    )
+                )
+
+            unpaired_zones = get_unpaired_zones(
+                generated_building.get("building_segments", []), segment_pairs, "$.zones[*]"
+            )
+            if unpaired_zones:
+                zone_map.update(
+                    self.build_zone_unit(
+                        building_key,
+                        unpaired_zones,
+                        get_unmatched_zones(reference_building, "$.building_segments[*].zones[*]", zone_map),
+                    )
+                )
+
+        unpaired_zones = get_unpaired_zones(
+            generated_rmd.get("buildings", []), building_pairs, "$.building_segments[*].zones[*]"
+        )
+        if unpaired_zones:
+            zone_map.update(
+                self.build_zone_unit(
+                    rmd_key,
+                    unpaired_zones,
+                    get_unmatched_zones(reference_rmd, "$.buildings[*].building_segments[*].zones[*]", zone_map),
+                )
+            )
+
+        return zone_map
+
+    def build_zone_unit(self, unit_key, generated_zones, reference_zones):
+        """Returns the map of a group of generated zones matched against a group of reference zones."""
+        zone_map, _ = self.build_unit(
+            unit_key,
+            [[zone["id"] for zone in generated_zones], [zone["id"] for zone in reference_zones]],
+            lambda: (get_mapping("Zones", generated_zones, reference_zones), []),
+        )
+        return zone_map
+
+    def map_hvac(self):
+        inputs = [
+            get_dict_of_zones_and_terminals_served_by_hvac_sys(self.generated_view),
+            get_dict_of_zones_and_terminals_served_by_hvac_sys(self.reference_view),
+            {zone["id"]: self.rmd_map.get(zone["id"]) for zone in get_zones_from_json(self.generated_view)},
+        ]
+        return self.build_rmd_unit("hvac", inputs, define_hvac_map)
+
+    def map_surfaces(self):
+        surface_map = {}
+        generated_graph, reference_graph = self.get_surface_graphs()
+        # Surfaces are matched zone by zone, so only the zones whose surfaces changed are matched again
+        for generated_zone, reference_zone in self.iter_mapped_zones():
+            generated_zone_id, reference_zone_id = generated_zone["id"], reference_zone["id"]
+            inputs = [
+                generated_graph.owned_surfaces.get(generated_zone_id, []),
+                generated_graph.adjacent_surfaces.get(generated_zone_id, []),
+                reference_graph.owned_surfaces.get(reference_zone_id, []),
+                reference_graph.adjacent_surfaces.get(reference_zone_id, []),
+            ]
+            zone_surface_map, _ = self.build_unit(
+                ("surfaces", *self.get_rmd_ids(), generated_zone_id, reference_zone_id),
+                inputs,
+                lambda: (
+                    define_surface_map(
+                        generated_zone,
+                        reference_zone,
+                        self.generated_view,
+                        self.reference_view,
+                        generated_graph=generated_graph,
+                        reference_graph=reference_graph,
+                    ),
+                    [],
+                ),
+            )
+            surface_map.update(zone_surface_map)
+        return surface_map, []
+
+    def map_terminals(self):
+        terminal_map = {}
+        errors = []
+        # Terminals are matched zone by zone, so only the zones whose terminals changed are matched again
+        for generated_zone, reference_zone in self.iter_mapped_zones():
+            generated_terminals = generated_zone.get("terminals", [])
+            inputs = [
+                generated_terminals,
+                reference_zone.get("terminals", []),
+                {
+                    hvac_id: self.rmd_map.get(hvac_id)
+                    for terminal in generated_terminals
+                    if isinstance(
+                        hvac_id := terminal.get("served_by_heating_ventilating_air_conditioning_system"), str
+                    )
+                },
+            ]
+            zone_terminal_map, terminal_map_errors = self.build_unit(
+                ("terminals", *self.get_rmd_ids(), generated_zone["id"], reference_zone["id"]),
+                inputs,
+                lambda: define_terminal_map(self.rmd_map, generated_zone, reference_zone),
+            )
+            terminal_map.update(zone_terminal_map)
+            errors.extend(terminal_map_errors)
+        return terminal_map, errors
+
+    def map_constructions(self):
+        inputs = [
+            get_dict_of_surfaces_with_construction_assigned(self.generated_view),
+            get_dict_of_surfaces_with_construction_assigned(self.reference_view),
+        ]
+        return self.build_rmd_unit("constructions", inputs, define_construction_map)
+
+    def map_materials(self):
+        inputs = [
+            *self.get_collection_inputs("$.ruleset_model_descriptions[0].materials[*]"),
+            find_all("$.ruleset_model_descriptions[0].constructions[*]", self.generated_view),
+        ]
+        return self.build_rmd_unit("materials", inputs, define_materials_map)
+
+    def map_boilers(self):
+        inputs = self.get_collection_inputs("$.ruleset_model_descriptions[0].boilers[*]")
+        return self.build_rmd_unit("boilers", inputs, define_boiler_map)
+
+    def map_chillers(self):
+        inputs = self.get_collection_inputs("$.ruleset_model_descriptions[0].chillers[*]")
+        return self.build_rmd_unit("chillers", inputs, define_chiller_map)
+
+    def map_heat_rejections(self):
+        inputs = self.get_collection_inputs("$.ruleset_model_descriptions[0].heat_rejections[*]")
+        return self.build_rmd_unit("heat_rejections", inputs, define_heat_rejection_map)
+
+    def map_loops(self):
+        inputs = self.get_collection_inputs("$.ruleset_model_descriptions[0].fluid_loops[*]")
+        return self.build_rmd_unit("loops", inputs, define_loop_map)
+
+    def map_pumps(self):
+        inputs = self.get_collection_inputs("$.ruleset_model_descriptions[0].pumps[*]", "loop_or_piping")
+        return self.build_rmd_unit("pumps", inputs, define_pump_map)
+
+
+def map_family_in_worker(rmd_mapper, family):
+    """
+    Builds the map of a family within a pair of RMDs in a worker process, reusing the units of its map cache.
+
+    Returns
+    -------
+    tuple: (map, errors, printed output, units built, keys of the units reused or built)
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        family_map, family_errors = getattr(rmd_mapper, f"map_{family}")()
+    unit_cache = rmd_mapper.map_cache
+    if unit_cache is None:
+        return family_map, family_errors, output.getvalue(), {}, set()
+    return family_map, family_errors, output.getvalue(), unit_cache.new_units, unit_cache.used_unit_keys
+
+
+def map_objects(
+    generated_json, reference_json, generated_index=None, reference_index=None, executor=None, map_cache=None
+):
+    """
+    Maps the generated objects to the reference objects.
+    When an executor is given, the maps of families that do not rely on each other are built concurrently.
+    When a map_cache is given, the maps it holds are reused and the maps that are built are added to it.
+
+    Returns
+    -------
+    tuple: (ObjectMap with the zones mapped and every other family mapped on demand, warnings, errors)
+    """
+    warnings = []
+
+    if generated_index is None:
+        generated_index = RPDIndex(generated_json)
+    if reference_index is None:
+        reference_index = RPDIndex(reference_json)
+
+    object_id_map = ObjectMap(
+        generated_json, reference_json, generated_index, reference_index, executor, map_cache
     )
-    object_id_map.update(pump_map)
-    errors.extend(pump_map_errors)
+    object_id_map.require(["zones"])
+
+    return object_id_map, warnings, list(object_id_map.errors)
 
-    return object_id_map, warnings, errors
+
+def match_containers(generated_containers, reference_containers):
+    """
+    Pairs generated and reference containers, such as RMDs, buildings or building segments, by their ids.
+    A single generated container is always paired with a single reference container.
+
+    Returns
+    -------
+    list: (generated container, reference container) pairs in the order of the generated containers
+    """
+    generated_containers = [container for container in generated_containers if isinstance(container, dict)]
+    reference_containers = [container for container in reference_containers if isinstance(container, dict)]
+    if len(generated_containers) == 1 and len(reference_containers) == 1:
+        return [(generated_containers[0], reference_containers[0])]
+
+    mapping = match_by_id(generated_containers, reference_containers)
+    reference_containers_by_id = {}
+    for reference_container in reference_containers:
+        reference_containers_by_id.setdefault(reference_container.get("id"), reference_container)
+    return [
+        (generated_container, reference_containers_by_id[mapping[generated_container.get("id")]])
+        for generated_container in generated_containers
+        if generated_container.get("id") in mapping
+    ]
+
+
+def get_unpaired_zones(generated_containers, container_pairs, zones_path):
+    """Returns the zones of the generated containers, such as building segments, that were not paired."""
+    paired_containers = {id(generated_container) for generated_container, _ in container_pairs}
+    return [
+        zone
+        for generated_container in generated_containers
+        if isinstance(generated_container, dict) and id(generated_container) not in paired_containers
+        for zone in find_all(zones_path, generated_container)
+    ]
+
+
+def get_unmatched_zones(reference_container, zones_path, zone_map):
+    """Returns the zones of a reference container, such as a building, that no generated zone is mapped to yet."""
+    matched_zone_ids = set(zone_map.values())
+    return [zone for zone in find_all(zones_path, reference_container) if zone["id"] not in matched_zone_ids]
 
 
 def match_by_id(generated_values, reference_values):
     """Matches generated and reference objects by ID."""
     mapping, used_ids = {}, set()
+    name_matcher = NameMatcher([ref.get("id") for ref in reference_values])
     for generated_object in generated_values:
-        best_match = find_best_match(
-            generated_object.get("id"), [ref.get("id") for ref in reference_values]
-        )
+        best_match = name_matcher.best_match(generated_object.get("id"))
         if best_match and best_match not in used_ids:
             mapping[generated_object.get("id")] = best_match
             used_ids.add(best_match)
@@ -634,22 +1215,39 @@ def match_by_id(generated_values, reference_values):
 def match_by_attributes(
     generated_values, reference_values, generated_zone_id, reference_zone_id, attrs
 ):
-    """Matches generated and reference objects based on specified attributes."""
-    mapping = {}
-    used_reference_ids = set()
+    """Matches generated and reference objects based on specified attributes.
 
-    for generated_object in generated_values:
-        best_match = get_best_match_attrs(
-            generated_object,
-            reference_values,
-            attrs,
-            generated_zone_id,
-            reference_zone_id,
-            used_reference_ids,
+    Generated and reference objects are paired one-to-one to match the most attributes in total. Where several
+    pairings do equally well, each generated object keeps the best match it would get on its own. Any generated
+    objects left over when there are more generated than reference objects take their best match on their own.
+    """
+    reference_ids = [reference_object.get("id") for reference_object in reference_values]
+
+    # Sets of surfaces too large for the optimal assignment are matched greedily, which buckets of matching
+    # area and azimuth do in near-linear time without scoring every pair
+    if (
+        sorted(attrs) == ["area", "azimuth"]
+        and max(len(generated_values), len(reference_values)) > HUNGARIAN_MAX_SIZE
+        and can_bucket_surfaces(generated_values, reference_values)
+    ):
+        best_positions, assignment = match_surfaces_by_buckets(
+            generated_values, reference_values, generated_zone_id, reference_zone_id
         )
-        if best_match:
-            mapping[generated_object.get("id")] = best_match.get("id")
-            used_reference_ids.add(best_match.get("id"))
+    else:
+        scores = build_score_matrix(
+            generated_values, reference_values, attrs, generated_zone_id, reference_zone_id
+        )
+        best_positions = get_best_match_positions(scores, reference_ids)
+        assignment = solve_assignment(
+            scores,
+            [(i, j) for i, j in enumerate(best_positions) if j is not None],
+        )
+
+    mapping = {}
+    for i, generated_object in enumerate(generated_values):
+        j = assignment.get(i, best_positions[i])
+        if j is not None:
+            mapping[generated_object.get("id")] = reference_ids[j]
 
     return mapping
 
@@ -662,34 +1260,17 @@ def match_by_attributes_with_excess_generated(
     Handles cases where generated list is longer than reference list.
     Each reference object is used at most once. Unmatched generated objects are excluded.
     """
-    all_matches = []
-
-    # Generate all possible (gen_id, ref_id, score) tuples
-    for gen_obj in generated_values:
-        gen_id = gen_obj.get("id")
-        for ref_obj in reference_values:
-            ref_id = ref_obj.get("id")
-            score = sum(
-                compare_attributes(gen_obj, ref_obj, attr)
-                for attr in attrs
-            )
-            all_matches.append((gen_id, ref_id, score))
-
-    # Sort all potential matches by descending score
-    all_matches.sort(key=lambda x: -x[2])
-
-    mapping = {}
-    used_gen_ids = set()
-    used_ref_ids = set()
+    scores = build_score_matrix(generated_values, reference_values, attrs)
 
-    # Greedily select highest-scoring matches without reusing any IDs
-    for gen_id, ref_id, score in all_matches:
-        if gen_id not in used_gen_ids and ref_id not in used_ref_ids:
-            mapping[gen_id] = ref_id
-            used_gen_ids.add(gen_id)
-            used_ref_ids.add(ref_id)
+    # Start from the highest-scoring pairs and only change them where that matches more attributes in total
+    assignment = solve_assignment(scores, greedy_assignment(scores).items())
 
-    return mapping
+    # Order the mapping by descending score, as the pairs are selected
+    pairs = sorted(assignment.items(), key=lambda pair: (-scores[pair], pair))
+    return {
+        generated_values[i].get("id"): reference_values[j].get("id")
+        for i, j in pairs
+    }
 
 
 def match_constructions_by_surfaces_assigned(generated_values, reference_values, object_id_map):
@@ -751,6 +1332,9 @@ def match_terminals_by_references(generated_values, reference_values, object_id_
     """Matches generated and reference terminal objects based on references to the HVAC systems that serve them."""
     mapping = {}
     used_reference_ids = set()
+    reference_terminals_by_hvac = group_by_reference(
+        reference_values, "served_by_heating_ventilating_air_conditioning_system"
+    )
 
     for generated_object in generated_values:
         generated_hvac_id = generated_object.get(
@@ -761,15 +1345,11 @@ def match_terminals_by_references(generated_values, reference_values, object_id_
         if generated_hvac_id:
             reference_hvac_id = object_id_map.get(generated_hvac_id)
             if reference_hvac_id:
-                best_match = next(
-                    (
-                        terminal
-                        for terminal in reference_values
-                        if terminal.get("id") not in used_reference_ids and
-                        terminal.get("served_by_heating_ventilating_air_conditioning_system") == reference_hvac_id
-                    ),
-                    None,
-                )
+                # The first unused reference terminal served by the mapped HVAC system
+                candidates = reference_terminals_by_hvac.get(reference_hvac_id, ())
+                while candidates and candidates[0].get("id") in used_reference_ids:
+                    candidates.popleft()
+                best_match = candidates[0] if candidates else None
 
         if not best_match:
             best_match = get_best_match_attrs(
@@ -799,26 +1379,31 @@ def match_terminals_by_references(generated_values, reference_values, object_id_
 def match_pumps_by_references(generated_values, reference_values, object_id_map):
     """Match generated and reference pumps based on references to the loops that they serve."""
     mapping = {}
+    reference_pumps_by_loop = group_by_reference(reference_values, "loop_or_piping")
+
     for generated_object in generated_values:
         generated_loop_id = generated_object.get("loop_or_piping")
         if generated_loop_id:
             reference_loop_id = object_id_map.get(generated_loop_id)
             if reference_loop_id:
-                best_match = next(
-                    (
-                        reference_value
-                        for reference_value in reference_values
-                        if reference_value.get("loop_or_piping") == reference_loop_id
-                    ),
-                    None,
-                )
-                if best_match:
-                    mapping[generated_object.get("id")] = best_match.get("id")
-                    reference_values.remove(best_match)
+                # Each reference pump is matched at most once, in the order the pumps of its loop are listed
+                candidates = reference_pumps_by_loop.get(reference_loop_id)
+                if candidates:
+                    mapping[generated_object.get("id")] = candidates.popleft().get("id")
 
     return mapping
 
 
+def group_by_reference(reference_values, key):
+    """Returns the reference objects grouped by the id they reference by a key, each group in its original order."""
+    groups = {}
+    for reference_value in reference_values:
+        referenced_id = reference_value.get(key)
+        if isinstance(referenced_id, str):
+            groups.setdefault(referenced_id, deque()).append(reference_value)
+    return groups
+
+
 
 def get_best_match_attrs(
     target, candidates, attrs, generated_zone_id, reference_zone_id, used_reference_ids
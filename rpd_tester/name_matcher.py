@@ -0,0 +1,73 @@
+from collections import Counter
+from difflib import SequenceMatcher
+
+# Number of names sharing the most trigrams with a target that are scored before any other name
+SHORTLIST_SIZE = 8
+
+
+def get_trigrams(name):
+    """Returns the character trigrams of a name, padded so that names shorter than three characters have some."""
+    padded_name = f"  {name} "
+    return {padded_name[i:i + 3] for i in range(len(padded_name) - 2)}
+
+
+class NameMatcher:
+    """
+    Finds the closest name to a target among a fixed set of names, returning the same match as
+    difflib.get_close_matches(target, names, n=1, cutoff=cutoff).
+
+    A character-trigram inverted index over the names is built once. For each target, the names sharing the most
+    trigrams with it are scored with SequenceMatcher first; every other name is then only scored when the
+    upper bounds SequenceMatcher itself uses (real_quick_ratio and quick_ratio) show that it could still be
+    a better match, so most names are never compared character by character.
+    """
+
+    def __init__(self, names, cutoff=0.4):
+        self.names = list(dict.fromkeys(names))
+        self.cutoff = cutoff
+        self.char_counts = [Counter(name) for name in self.names]
+        # Trigram -> positions of the names containing it
+        self.trigram_index: dict[str, list[int]] = {}
+        for position, name in enumerate(self.names):
+            for trigram in get_trigrams(name):
+                self.trigram_index.setdefault(trigram, []).append(position)
+
+    def get_shortlist(self, target):
+        """Returns the positions of the names sharing the most trigrams with the target."""
+        overlap = Counter()
+        for trigram in get_trigrams(target):
+            overlap.update(self.trigram_index.get(trigram, ()))
+        return [position for position, _ in overlap.most_common(SHORTLIST_SIZE)]
+
+    def best_match(self, target):
+        """Returns the name with the highest SequenceMatcher ratio to the target at or above the cutoff, or None."""
+        sequence_matcher = SequenceMatcher()
+        sequence_matcher.set_seq2(target)
+        target_counts = Counter(target)
+        best_score, best_name = None, None
+
+        def could_improve(score, name):
+            # get_close_matches keeps the highest (score, name) pair, so ties go to the greater name
+            return score >= self.cutoff and (best_score is None or (score, name) > (best_score, best_name))
+
+        shortlist = self.get_shortlist(target)
+        shortlisted = set(shortlist)
+        remaining = (position for position in range(len(self.names)) if position not in shortlisted)
+
+        for position in [*shortlist, *remaining]:
+            name = self.names[position]
+            length = len(name) + len(target)
+
+            # Upper bounds of the ratio from the lengths and then the characters of the two names
+            if length and not could_improve(2.0 * min(len(name), len(target)) / length, name):
+                continue
+            matching_chars = sum((self.char_counts[position] & target_counts).values())
+            if length and not could_improve(2.0 * matching_chars / length, name):
+                continue
+
+            sequence_matcher.set_seq1(name)
+            score = sequence_matcher.ratio()
+            if could_improve(score, name):
+                best_score, best_name = score, name
+
+        return best_name
@@ -0,0 +1,405 @@
+import re
+from functools import lru_cache
+from typing import Any, NamedTuple
+
+# Maximum number of compiled paths kept in memory. Comparison specs contain roughly two thousand distinct paths.
+PATH_CACHE_SIZE = 4096
+
+# Regex to identify array index patterns like [*], [0], [1], etc.
+BRACKET_PATTERN = re.compile(r"\[([^]]*)]")
+
+# Pattern for a single filter condition: @.field = 'value' or @.field == "value"
+CONDITION_PATTERN = re.compile(r'\s*@\.(\w+)\s*==?\s*(["\'])(.*?)\2')
+
+# Pattern for the conjunction joining two filter conditions: "and" or "&"
+CONJUNCTION_PATTERN = re.compile(r"\s*(?:&|and\s)")
+
+
+def split_path(jpath):
+    # If the path starts with "$.", remove it
+    if jpath.startswith("$."):
+        jpath = jpath[2:]
+
+    result = []
+    current_segment = []
+    bracket_depth = 0
+
+    for char in jpath:
+        if char == "[":
+            bracket_depth += 1
+            current_segment.append(char)
+        elif char == "]":
+            bracket_depth -= 1
+            current_segment.append(char)
+        elif char == "." and bracket_depth == 0:
+            # We are at a top-level dot, split here
+            segment_str = "".join(current_segment).strip()
+            if segment_str:
+                result.append(segment_str)
+            current_segment = []
+        else:
+            current_segment.append(char)
+
+    # Add the last segment if it exists
+    segment_str = "".join(current_segment).strip()
+    if segment_str:
+        result.append(segment_str)
+    return result
+
+
+def parse_path_segment(segment):
+    """
+    Given a path segment (like "surfaces[*][?(@.adjacent_to == 'EXTERIOR')]"),
+    split it into a list of operations:
+
+    For example:
+    "surfaces[*][?(@.adjacent_to == 'EXTERIOR')]" ->
+    [("key", "surfaces"), ("index", "*"), ("filter", "@.adjacent_to == 'EXTERIOR'")]
+    """
+    parts = []
+    m = BRACKET_PATTERN.split(segment)
+    base_key = m[0]
+    if base_key:
+        parts.append(("key", base_key))
+
+    for i in range(1, len(m)):
+        content = m[i].strip()
+        if content == "":
+            continue
+        if content.startswith("?(") and content.endswith(")"):
+            # Filter condition
+            condition = content[2:-1].strip()
+            parts.append(("filter", condition))
+        else:
+            parts.append(("index", content))
+
+    return parts
+
+
+def parse_filter_condition(condition_str):
+    """
+    Parse a filter condition string into a list of (field, value) equality checks.
+    Conditions can have `@.field == "value"` format and multiple conditions joined by "and" or "&".
+    Values are matched up to their closing quote, so they may contain the other quote character or a conjunction.
+
+    Returns None when any of the conditions cannot be parsed, in which case the filter matches nothing.
+    """
+    checks = []
+    position = 0
+
+    while True:
+        match = CONDITION_PATTERN.match(condition_str, position)
+        if not match:
+            return None
+        field, _, value = match.groups()
+        checks.append((field, value))
+
+        conjunction = CONJUNCTION_PATTERN.match(condition_str, match.end())
+        if not conjunction:
+            # Any trailing text after the last condition is ignored
+            return checks
+        position = conjunction.end()
+
+
+def compile_checks_predicate(checks):
+    """Compile a list of (field, value) equality checks into a predicate that accepts a dict."""
+    if len(checks) == 1:
+        field, value = checks[0]
+        return lambda obj_inst: field in obj_inst and obj_inst[field] == value
+
+    # All conditions must be True
+    return lambda obj_inst: all(
+        field in obj_inst and obj_inst[field] == value for field, value in checks
+    )
+
+
+def compile_filter_predicate(condition_str):
+    """Compile a filter condition string into a predicate that accepts a dict."""
+    checks = parse_filter_condition(condition_str)
+
+    if checks is None:
+        return lambda obj_inst: False
+
+    return compile_checks_predicate(checks)
+
+
+def compile_filter_operation(predicate):
+    """Compile a filter operation that keeps only the objects satisfying the predicate."""
+
+    def apply_filter(r):
+        if isinstance(r, dict):
+            return [r] if predicate(r) else []
+        if isinstance(r, list):
+            # If it's a list, apply the filter to each element
+            return [item for item in r if isinstance(item, dict) and predicate(item)]
+        return []
+
+    return apply_filter
+
+
+def compile_operation(op_type, value):
+    """Compile a single path operation into a function mapping an object to a list of results."""
+    if op_type == "key":
+        key = value.split("==")[0]
+
+        def get_key(r):
+            # Fetch the value for the given key if r is a dict
+            if isinstance(r, dict) and key in r:
+                return [r[key]]
+            return []
+
+        return get_key
+
+    if op_type == "index":
+        if value == "*":
+            return lambda r: r if isinstance(r, list) else []
+
+        try:
+            # Numeric index
+            idx = int(value)
+        except ValueError:
+            # Invalid index
+            return lambda r: []
+
+        def get_index(r):
+            if isinstance(r, list) and 0 <= idx < len(r):
+                return [r[idx]]
+            return []
+
+        return get_index
+
+    # Filter the results; only objects that satisfy the condition remain
+    return compile_filter_operation(compile_filter_predicate(value))
+
+
+def compile_context_operation(op_type, value):
+    """
+    Compile a single path operation into a function mapping an (object, concrete path) pair
+    to a list of (result, concrete path) pairs.
+    """
+    if op_type == "key":
+        key = value.split("==")[0]
+
+        def get_key(r, path):
+            if isinstance(r, dict) and key in r:
+                return [(r[key], f"{path}.{key}")]
+            return []
+
+        return get_key
+
+    if op_type == "index":
+        if value == "*":
+            return lambda r, path: (
+                [(item, f"{path}[{i}]") for i, item in enumerate(r)] if isinstance(r, list) else []
+            )
+
+        try:
+            idx = int(value)
+        except ValueError:
+            return lambda r, path: []
+
+        def get_index(r, path):
+            if isinstance(r, list) and 0 <= idx < len(r):
+                return [(r[idx], f"{path}[{idx}]")]
+            return []
+
+        return get_index
+
+    predicate = compile_filter_predicate(value)
+
+    def apply_filter(r, path):
+        if isinstance(r, dict):
+            return [(r, path)] if predicate(r) else []
+        if isinstance(r, list):
+            return [
+                (item, f"{path}[{i}]")
+                for i, item in enumerate(r)
+                if isinstance(item, dict) and predicate(item)
+            ]
+        return []
+
+    return apply_filter
+
+
+def apply_operations(operations, results):
+    """Apply a sequence of compiled operations to a list of objects, returning the matched values in order."""
+    for operation in operations:
+        new_results = []
+        for r in results:
+            new_results.extend(operation(r))
+        results = new_results
+
+        # If no results remain, break early
+        if not results:
+            break
+
+    return results
+
+
+class PathMatch(NamedTuple):
+    value: Any
+    # Concrete path of the value, e.g. "$.ruleset_model_descriptions[0].boilers[1].rated_capacity"
+    path: str
+    # Object matched by the path without its last segment
+    parent: Any
+    parent_id: str | None
+
+
+class CompiledPath:
+    """A JSON path that has been parsed once into a flat sequence of operations."""
+
+    __slots__ = ("jpath", "steps", "operations", "parent_depth", "_context_operations")
+
+    def __init__(self, jpath):
+        self.jpath = jpath
+
+        # Preprocessing the jpath: remove leading "$."
+        stripped_path = jpath.strip()
+        if stripped_path.startswith("$."):
+            stripped_path = stripped_path[2:]
+
+        # The parsed (op_type, value) steps are kept alongside the compiled operations for query planning
+        segment_steps = [parse_path_segment(segment) for segment in split_path(stripped_path) if segment]
+        self.steps = tuple(step for steps in segment_steps for step in steps)
+        self.operations = tuple(compile_operation(op_type, value) for op_type, value in self.steps)
+        # Number of steps matching the parent of the values, i.e. every segment but the last
+        self.parent_depth = len(self.steps) - len(segment_steps[-1]) if segment_steps else 0
+        self._context_operations = None
+
+    def __repr__(self):
+        return f"CompiledPath({self.jpath!r})"
+
+    def find_all(self, obj):
+        """Return every value in obj matched by this path, in document order."""
+        return apply_operations(self.operations, [obj])
+
+    def find_all_with_context(self, obj):
+        """
+        Return a PathMatch for every value in obj matched by this path, in document order.
+
+        Each match carries its concrete path and the object matched by the path without its last segment,
+        so values are paired with their parents by the traversal itself.
+        """
+        if self._context_operations is None:
+            self._context_operations = tuple(
+                compile_context_operation(op_type, value) for op_type, value in self.steps
+            )
+
+        results = [(obj, "$", obj)]
+        for depth, operation in enumerate(self._context_operations):
+            new_results = []
+            for r, path, parent in results:
+                if depth == self.parent_depth:
+                    parent = r
+                new_results.extend((match, match_path, parent) for match, match_path in operation(r, path))
+            results = new_results
+
+            if not results:
+                break
+
+        return [
+            PathMatch(value, path, parent, parent.get("id") if isinstance(parent, dict) else None)
+            for value, path, parent in results
+        ]
+
+    def iter_all(self, obj):
+        """Yield every value in obj matched by this path, depth-first and in document order, without collecting them."""
+        operations = self.operations
+        if not operations:
+            yield obj
+            return
+
+        last = len(operations) - 1
+        # Each frame is an iterator over the matches of one operation for one object
+        stack = [iter(operations[0](obj))]
+        while stack:
+            for match in stack[-1]:
+                if len(stack) > last:
+                    yield match
+                else:
+                    stack.append(iter(operations[len(stack)](match)))
+                    break
+            else:
+                stack.pop()
+
+    def find_first(self, obj, default=None):
+        """Return the first value in obj matched by this path, stopping at the first match, or default."""
+        return next(self.iter_all(obj), default)
+
+    def find_all_where(self, filters, obj):
+        """Return the objects matched by this path whose fields equal every value in the filters dict."""
+        apply_filter = compile_filter_operation(
+            compile_checks_predicate(list(filters.items()))
+        )
+        results = []
+        for r in self.find_all(obj):
+            results.extend(apply_filter(r))
+        return results
+
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def compile_path(jpath):
+    """Compile a JSON path string, reusing the compiled query for repeated paths."""
+    return CompiledPath(jpath)
+
+
+class PathTrieNode:
+    __slots__ = ("operation", "children", "jpaths")
+
+    def __init__(self, operation=None):
+        self.operation = operation
+        self.children = {}
+        self.jpaths = []
+
+
+class PathTrie:
+    """
+    A set of compiled paths merged on their common prefixes.
+
+    Evaluating the trie walks a document once for all of its paths: the objects matched by a shared prefix
+    such as "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*]" are found a single
+    time and then fed to every path that continues from them.
+    """
+
+    def __init__(self, jpaths=()):
+        self.root = PathTrieNode()
+        self.jpaths = []
+        for jpath in jpaths:
+            self.add(jpath)
+
+    def add(self, jpath):
+        compiled = compile_path(jpath)
+        node = self.root
+        for step, operation in zip(compiled.steps, compiled.operations):
+            child = node.children.get(step)
+            if child is None:
+                child = node.children[step] = PathTrieNode(operation)
+            node = child
+        node.jpaths.append(jpath)
+        self.jpaths.append(jpath)
+
+    def find_all(self, obj):
+        """Returns a dict mapping each path in the trie to the values it matches in obj, in document order."""
+        results = {jpath: [] for jpath in self.jpaths}
+
+        stack = [(self.root, [obj])]
+        while stack:
+            node, matches = stack.pop()
+            for jpath in node.jpaths:
+                results[jpath] = matches
+
+            for child in node.children.values():
+                child_matches = []
+                for match in matches:
+                    child_matches.extend(child.operation(match))
+
+                # Paths below a prefix with no matches keep their empty result
+                if child_matches:
+                    stack.append((child, child_matches))
+
+        return results
+
+
+def find_all_paths(jpaths, obj):
+    """Evaluates several paths against obj in a single walk, returning a dict of path -> matched values."""
+    return PathTrie(jpaths).find_all(obj)
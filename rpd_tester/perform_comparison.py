@@ -1,9 +1,19 @@
+import io
 import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
 from enum import Enum
+from typing import NamedTuple
 
 from rpd_tester.utils import *
-from rpd_tester.map_objects import map_objects
+from rpd_tester.map_objects import COLLECTION_FAMILIES, map_objects
+from rpd_tester.rpd_index import RPDIndex
+from rpd_tester.path_engine import compile_path
+from rpd_tester.schedules import compare_fingerprints, compare_hourly_values
+from rpd_tester.rpd_loader import get_required_keys, load_rpd
+from rpd_tester.cache import load_cached_rpd, load_object_map_cache, save_cached_rpd
 
 # RPD Generation Test Report
 results_data = {
@@ -33,16 +43,20 @@ class TestOutcomeOptions(Enum):
 
 
 # Test Case Report
-def add_test_case_report(test_case_dir, generated_file_name):
+def create_test_case_report(test_case_dir, generated_file_name):
     files_utilized = [
         f.name for f in test_case_dir.iterdir() if f.is_file() and f.name != ".gitkeep"
     ]
-    test_case_report = {
+    return {
         "test_id": test_case_dir.name,
         "generated_file_name": generated_file_name,
         "files_utilized": files_utilized,
         "specification_tests": [],
     }
+
+
+def add_test_case_report(test_case_dir, generated_file_name):
+    test_case_report = create_test_case_report(test_case_dir, generated_file_name)
     results_data["test_case_reports"].append(test_case_report)
     return test_case_report
 
@@ -93,15 +107,45 @@ def compare_json_values(
     generated_ids,
     specification_test,
     object_id_map,
+    generated_index=None,
+    reference_index=None,
 ):
-    """Compares a list of generated and reference JSON values based on the spec."""
+    """
+    Compares a list of generated and reference JSON values based on the spec.
+
+    Schedule references are compared by the hourly values of the referenced schedules when the spec sets
+    "compare-schedule-values" and the RPD indexes are given; otherwise they are always a match.
+    """
     json_key_path = spec["json-key-path"]
     compare_value = spec.get("compare-value", True)
     tolerance = spec.get("tolerance", 0)
+    compare_schedule_values = (
+        spec.get("compare-schedule-values", False)
+        and "schedule" in json_key_path
+        and generated_index is not None
+        and reference_index is not None
+    )
+    # (generated schedule id, reference schedule id) -> ScheduleComparison, or None if either has no hourly values
+    schedule_comparisons = {}
 
     warnings = []
     errors = []
 
+    # Pairs of numbers are compared together as arrays, ahead of the element by element evaluation below
+    batched_matches = {}
+    if compare_value is not False:
+        batched_ids = [generated_id for generated_id in generated_values if generated_id in reference_values]
+        batched_results = compare_values_batch(
+            [generated_values[generated_id] for generated_id in batched_ids],
+            [reference_values[generated_id] for generated_id in batched_ids],
+            tolerance,
+        )
+        batched_matches = {
+            generated_id: does_match
+            for generated_id, does_match in zip(batched_ids, batched_results)
+            if does_match is not None
+        }
+
     for i, generated_id in enumerate(generated_ids):
 
         if generated_id not in generated_values and i in generated_values:
@@ -175,6 +219,52 @@ def compare_json_values(
                         errors.append(notes)
                 continue
 
+        elif isinstance(reference_value, str) and not compare_value and compare_schedule_values:
+            specification_test["evaluation_criteria"] = (
+                EvaluationCriteriaOptions.VALUE.value
+            )
+
+            schedule_key = (generated_value, reference_value)
+            if schedule_key not in schedule_comparisons:
+                schedule_comparisons[schedule_key] = compare_schedules(
+                    generated_index, reference_index, generated_value, reference_value, tolerance
+                )
+            schedule_comparison = schedule_comparisons[schedule_key]
+
+            if schedule_comparison is None:
+                notes = f"Hourly values not found for schedule '{generated_value}' or reference schedule '{reference_value}'"
+                add_test_result(
+                    specification_test,
+                    generated_id if not isinstance(generated_id, int) else None,
+                    reference_id if not isinstance(reference_id, int) else None,
+                    TestOutcomeOptions.UNKNOWN.value,
+                    notes,
+                )
+                warnings.append(notes)
+
+            elif schedule_comparison.mismatched_hours:
+                notes = schedule_comparison.describe()
+                add_test_result(
+                    specification_test,
+                    generated_id if not isinstance(generated_id, int) else None,
+                    reference_id if not isinstance(reference_id, int) else None,
+                    TestOutcomeOptions.DIFFER.value,
+                    notes,
+                )
+                errors.append(
+                    f"Schedule mismatch at '{generated_ids[i]}' for key '{json_key_path.split('.')[-1]}'. {notes}"
+                )
+
+            else:
+                add_test_result(
+                    specification_test,
+                    generated_id if not isinstance(generated_id, int) else None,
+                    reference_id if not isinstance(reference_id, int) else None,
+                    TestOutcomeOptions.MATCH.value,
+                    schedule_comparison.describe(),
+                )
+            continue  # The hourly values decide the outcome, regardless of the presence check below
+
         elif isinstance(reference_value, str) and not compare_value:
             specification_test["evaluation_criteria"] = (
                 EvaluationCriteriaOptions.REFERENCE.value
@@ -227,7 +317,10 @@ def compare_json_values(
         test_outcome = TestOutcomeOptions.NOT_IMPLEMENTED.value
 
         # Else: the values are strings, ints, or floats, and we need to compare them
-        does_match = compare_values(generated_value, reference_value, tolerance)
+        if generated_id in batched_matches:
+            does_match = batched_matches[generated_id]
+        else:
+            does_match = compare_values(generated_value, reference_value, tolerance)
 
         if does_match:
             test_outcome = TestOutcomeOptions.MATCH.value
@@ -264,8 +357,37 @@ def compare_json_values(
     return warnings, errors
 
 
+def compare_schedules(generated_index, reference_index, generated_schedule_id, reference_schedule_id, tolerance=None):
+    """
+    Compares the hourly values of a generated and a reference schedule.
+
+    Returns
+    -------
+    ScheduleComparison | None: None if either schedule cannot be found or has no numeric hourly values
+    """
+    # Identical schedules are matched by their fingerprints alone
+    schedule_comparison = compare_fingerprints(
+        generated_index.get_schedule_fingerprint(generated_schedule_id),
+        reference_index.get_schedule_fingerprint(reference_schedule_id),
+    )
+    if schedule_comparison is not None:
+        return schedule_comparison
+
+    generated_hourly_values = generated_index.get_hourly_values(generated_schedule_id)
+    reference_hourly_values = reference_index.get_hourly_values(reference_schedule_id)
+    if generated_hourly_values is None or reference_hourly_values is None:
+        return None
+    return compare_hourly_values(generated_hourly_values, reference_hourly_values, tolerance)
+
+
 def handle_special_cases(
-    path_spec, object_id_map, generated_json, reference_json, specification_test
+    path_spec,
+    object_id_map,
+    generated_json,
+    reference_json,
+    specification_test,
+    generated_index=None,
+    reference_index=None,
 ):
     warnings = []
     errors = []
@@ -387,13 +509,21 @@ def handle_special_cases(
         aligned_generated_values = {}
         aligned_reference_values = {}
 
-        generated_zones = get_zones_from_json(generated_json)
+        if generated_index is None:
+            generated_index = RPDIndex(generated_json)
+        if reference_index is None:
+            reference_index = RPDIndex(reference_json)
 
-        generated_surfaces = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("surfaces")) + 1
-            ],
-            generated_json,
+        surfaces_path = json_key_path[
+            : json_key_path.index("].", json_key_path.index("surfaces")) + 1
+        ]
+        generated_surfaces = generated_index.find_all(surfaces_path)
+        generated_graph = generated_index.surface_graph
+        lookup_reference_surfaces = reference_index.compile_aligned_object_lookup(
+            surfaces_path, "surfaces"
+        )
+        lookup_reference_value = reference_index.compile_aligned_lookup(
+            json_key_path, "surfaces"
         )
 
         # Iterate through the generated surfaces to populate data for each surface individually, ensuring correct alignment via object mapping
@@ -407,13 +537,9 @@ def handle_special_cases(
                 )
                 continue
 
-            aligned_reference_surface = find_one(
-                json_key_path[
-                    : json_key_path.index("].", json_key_path.index("surfaces")) + 1
-                ]
-                + f"[?(@.id == '{reference_surface_id}')]",
-                reference_json,
-                None,
+            aligned_reference_surfaces = lookup_reference_surfaces(reference_surface_id)
+            aligned_reference_surface = (
+                aligned_reference_surfaces[0] if aligned_reference_surfaces else None
             )
 
             if not aligned_reference_surface:
@@ -422,38 +548,18 @@ def handle_special_cases(
                 )
                 continue
 
-            generated_parent_zone = next(
-                zone
-                for zone in generated_zones
-                if any(
-                    surface["id"] == generated_surface_id
-                    for surface in zone.get("surfaces", [])
-                )
-            )
+            generated_parent_zone = generated_graph.surface_zones.get(generated_surface_id)
+            if generated_parent_zone is None:
+                generated_parent_zone = generated_index.get_entry(
+                    generated_surface_id, "surfaces"
+                ).parent
             generated_parent_zone_id = generated_parent_zone["id"]
             reference_parent_zone_id = object_id_map.get(generated_parent_zone_id)
 
             generated_value = generated_surface.get(json_key_path.split(".")[-1])
             aligned_generated_values[generated_surface_id] = generated_value
             # Extract values from aligned surfaces using the specified key path
-            if "surfaces[?(@" in json_key_path:
-                aligned_reference_value = find_one(
-                    json_key_path.replace(
-                        "surfaces[?(",
-                        f"surfaces[?(@.id == '{reference_surface_id}' & ",
-                    ),
-                    reference_json,
-                    None,
-                )
-            else:
-                aligned_reference_value = find_one(
-                    json_key_path.replace(
-                        "surfaces[*]",
-                        f"surfaces[?(@.id == '{reference_surface_id}')]",
-                    ),
-                    reference_json,
-                    None,
-                )
+            aligned_reference_value = lookup_reference_value(reference_surface_id)
             aligned_reference_values[generated_surface_id] = aligned_reference_value
 
             mismatched_wall_origin_adjacent_zone = (
@@ -624,11 +730,22 @@ def handle_special_cases(
 
 
 def handle_ordered_comparisons(
-    path_spec, object_id_map, reference_json, generated_json, specification_test
+    path_spec,
+    object_id_map,
+    reference_json,
+    generated_json,
+    specification_test,
+    reference_index=None,
+    generated_index=None,
 ):
     json_key_path = path_spec["json-key-path"]
     compare_value = path_spec.get("compare-value", True)
 
+    if generated_index is None:
+        generated_index = RPDIndex(generated_json)
+    if reference_index is None:
+        reference_index = RPDIndex(reference_json)
+
     specification_test["evaluation_criteria"] = (
         EvaluationCriteriaOptions.VALUE.value
         if compare_value
@@ -638,669 +755,78 @@ def handle_ordered_comparisons(
     warnings = []
     errors = []
 
-    # Handle comparison of data derived from zones which may not be in the same order as the reference zones
-    if (
-        "zones[" in json_key_path
-        and "surfaces[" not in json_key_path
-        and "terminals[" not in json_key_path
-    ):
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_zones = get_zones_from_json(generated_json)
-        generated_zone_ids = [zone["id"] for zone in generated_zones]
-
-        # Populate data for each zone individually and ensure correct alignment via object mapping
-        for generated_zone in generated_zones:
-            generated_zone_id = generated_zone["id"]
-            reference_zone_id = object_id_map[generated_zone_id]
-
-            zone_data_path = json_key_path[(json_key_path.index("].", json_key_path.index("zones")) + 2):]
-            generated_value = find_one(zone_data_path, generated_zone)
-            aligned_generated_values[generated_zone_id] = generated_value
-            # Extract values from aligned zones using the specified key path
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "zones[*]", f"zones[?(@.id == '{reference_zone_id}')]"
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_zone_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_zone_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "surfaces[" in json_key_path:
-        # Handle comparison of data derived from surfaces which may not be in the same order as the reference surfaces
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        # Populate data for each surface individually and ensure correct alignment via object mapping
-        generated_surfaces = find_all(
-            # Extract the key path for the surface (everything before surfaces[]. )
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("surfaces")) + 1
-            ],
-            generated_json,
-        )
-        generated_surface_ids = [surface["id"] for surface in generated_surfaces]
-
-        for generated_surface in generated_surfaces:
-            generated_surface_id = generated_surface["id"]
-            reference_surface_id = object_id_map.get(generated_surface_id)
-
-            # Extract the key path for the surface data (everything after surfaces[]. )
-            generated_value = find_one(
-                json_key_path[json_key_path.index("].", json_key_path.index("surfaces")) + 2:],
-                generated_surface,
-            )
-            aligned_generated_values[generated_surface_id] = generated_value
-
-            # Extract values from aligned surfaces using the specified key path
-            if "surfaces[?(@" in json_key_path:
-                aligned_reference_value = find_one(
-                    json_key_path.replace(
-                        "surfaces[?(",
-                        f"surfaces[?(@.id == '{reference_surface_id}' & ",
-                    ),
-                    reference_json,
-                    None,
-                )
-            else:
-                aligned_reference_value = find_one(
-                    json_key_path.replace(
-                        "surfaces[*]",
-                        f"surfaces[?(@.id == '{reference_surface_id}')]",
-                    ),
-                    reference_json,
-                    None,
-                )
+    collection = get_aligned_collection(json_key_path)
+    if collection is None:
+        return warnings, errors
+    aligned_family = ALIGNED_FAMILIES[collection]
+
+    # Split the path into the objects of the collection, e.g. the zones, and the data path within each object
+    collection_end = json_key_path.index("].", json_key_path.index(collection)) + 1
+    generated_objects = generated_index.find_all(json_key_path[:collection_end])
+    generated_ids = [generated_object["id"] for generated_object in generated_objects]
+    data_path = compile_path(json_key_path[collection_end + 1:])
+    lookup_reference_value = reference_index.compile_aligned_lookup(json_key_path, collection)
+
+    # Populate data for each object individually and ensure correct alignment via object mapping
+    aligned_generated_values = {}
+    aligned_reference_values = {}
+    for generated_object, generated_id in zip(generated_objects, generated_ids):
+        reference_id = object_id_map.get(generated_id)
+        if isinstance(reference_id, dict):
+            reference_id = reference_id.get("id")
 
-            aligned_reference_values[generated_surface_id] = aligned_reference_value
+        if not reference_id and aligned_family.skip_unmapped:
+            continue
 
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
+        aligned_generated_values[generated_id] = data_path.find_first(generated_object)
+        # Extract values from aligned objects using the specified key path
+        aligned_reference_values[generated_id] = lookup_reference_value(reference_id)
 
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_surface_ids,
+    if all(value is None for value in aligned_generated_values.values()):
+        notes = f"Missing key {json_key_path.split('.')[-1]}"
+        add_test_result(
             specification_test,
-            object_id_map,
-        )
-        warnings.extend(general_comparison_warnings)
-        errors.extend(general_comparison_errors)
-
-    elif "terminals[" in json_key_path:
-        # Handle comparison of data derived from surfaces which may not be in the same order as the reference surfaces
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        # Populate data for each surface individually and ensure correct alignment via object mapping
-        generated_terminals = find_all(
-            # Extract the key path for the surface (everything before surfaces[]. )
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("terminals")) + 1
-            ],
-            generated_json,
+            None,
+            None,
+            TestOutcomeOptions.NOT_IMPLEMENTED.value,
         )
-        generated_terminal_ids = [terminal["id"] for terminal in generated_terminals]
-
-        for generated_terminal in generated_terminals:
-            generated_terminal_id = generated_terminal["id"]
-            reference_terminal_id = object_id_map.get(generated_terminal_id)
-
-            # Extract the key path for the terminal data (everything after terminals[]. )
-            generated_value = find_one(
-                json_key_path[json_key_path.index("].", json_key_path.index("terminals")) + 2:],
-                generated_terminal,
-            )
-            aligned_generated_values[generated_terminal_id] = generated_value
-
-            # Extract values from aligned terminals using the specified key path
-            if "terminals[?(@" in json_key_path:
-                aligned_reference_value = find_one(
-                    json_key_path.replace(
-                        "terminals[?(",
-                        f'terminals[?(@.id=="{reference_terminal_id}" & ',
-                    ),
-                    reference_json,
-                    None,
-                )
-            else:
-                aligned_reference_value = find_one(
-                    json_key_path.replace(
-                        "terminals[*]",
-                        f"terminals[?(@.id == '{reference_terminal_id}')]",
-                    ),
-                    reference_json,
-                    None,
-                )
-
-            aligned_reference_values[generated_terminal_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
+        warnings.append(notes)
+        return warnings, errors
 
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_terminal_ids,
-            specification_test,
-            object_id_map,
-        )
+    general_comparison_warnings, general_comparison_errors = compare_json_values(
+        path_spec,
+        aligned_generated_values,
+        aligned_reference_values,
+        generated_ids,
+        specification_test,
+        object_id_map,
+        generated_index,
+        reference_index,
+    )
+    if aligned_family.report_warnings:
         warnings.extend(general_comparison_warnings)
-        errors.extend(general_comparison_errors)
-
-    elif "constructions[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_constructions = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("constructions")) + 1
-            ],
-            generated_json,
-        )
-        generated_construction_ids = [construction["id"] for construction in generated_constructions]
-
-        for generated_construction in generated_constructions:
-            generated_construction_id = generated_construction["id"]
-            reference_construction_id = object_id_map.get(generated_construction_id)
-
-            if isinstance(reference_construction_id, dict):
-                reference_construction_id = reference_construction_id.get("id")
-
-            if not reference_construction_id:
-                continue
-
-            construction_data_path = json_key_path[json_key_path.index("].", json_key_path.index("constructions")) + 2:]
-            generated_value = find_one(construction_data_path, generated_construction)
-            aligned_generated_values[generated_construction_id] = generated_value
-
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "constructions[*]",
-                    f"constructions[?(@.id == '{reference_construction_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_construction_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_construction_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "materials[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_materials = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("materials")) + 1
-            ],
-            generated_json,
-        )
-        generated_material_ids = [material["id"] for material in generated_materials]
-
-        for generated_material in generated_materials:
-            generated_material_id = generated_material["id"]
-            reference_material_id = object_id_map.get(generated_material_id)
-
-            if isinstance(reference_material_id, dict):
-                reference_material_id = reference_material_id.get("id")
-
-            if not reference_material_id:
-                continue
-
-            material_data_path = json_key_path[json_key_path.index("].", json_key_path.index("materials")) + 2:]
-            generated_value = find_one(material_data_path, generated_material)
-            aligned_generated_values[generated_material_id] = generated_value
-
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "materials[*]",
-                    f"materials[?(@.id == '{reference_material_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_material_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_material_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "heating_ventilating_air_conditioning_systems[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_hvacs = find_all(
-            json_key_path[
-                : json_key_path.index(
-                    "].",
-                    json_key_path.index("heating_ventilating_air_conditioning_systems"),
-                )
-                + 1
-            ],
-            generated_json,
-        )
-        generated_hvac_ids = [hvac["id"] for hvac in generated_hvacs]
-
-        # Populate data for each zone individually and ensure correct alignment via object mapping
-        for generated_hvac in generated_hvacs:
-            generated_hvac_id = generated_hvac["id"]
-            reference_hvac_id = object_id_map.get(generated_hvac_id)
-
-            if not reference_hvac_id:
-                continue
-
-            hvac_data_path = json_key_path[json_key_path.index("].", json_key_path.index("heating_ventilating_air_conditioning_systems"),) + 2:]
-            generated_value = find_one(hvac_data_path, generated_hvac)
-            aligned_generated_values[generated_hvac_id] = generated_value
-            # Extract values from aligned zones using the specified key path
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "heating_ventilating_air_conditioning_systems[*]",
-                    f"heating_ventilating_air_conditioning_systems[?(@.id == '{reference_hvac_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_hvac_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_hvac_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "boilers[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_boilers = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("boilers")) + 1
-            ],
-            generated_json,
-        )
-        generated_boiler_ids = [boiler["id"] for boiler in generated_boilers]
-
-        for generated_boiler in generated_boilers:
-            generated_boiler_id = generated_boiler["id"]
-            reference_boiler_id = object_id_map.get(generated_boiler_id)
-
-            if not reference_boiler_id:
-                continue
-
-            boiler_data_path = json_key_path[json_key_path.index("].", json_key_path.index("boilers")) + 2:]
-            generated_value = find_one(boiler_data_path, generated_boiler)
-            aligned_generated_values[generated_boiler_id] = generated_value
-
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "boilers[*]",
-                    f"boilers[?(@.id == '{reference_boiler_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_boiler_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_boiler_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "chillers[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_chillers = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("chillers")) + 1
-            ],
-            generated_json,
-        )
-        generated_chiller_ids = [chiller["id"] for chiller in generated_chillers]
-
-        for generated_chiller in generated_chillers:
-            generated_chiller_id = generated_chiller["id"]
-            reference_chiller_id = object_id_map.get(generated_chiller_id)
-
-            if not reference_chiller_id:
-                continue
-
-            chiller_data_path = json_key_path[json_key_path.index("].", json_key_path.index("chillers")) + 2:]
-            generated_value = find_one(chiller_data_path, generated_chiller)
-            aligned_generated_values[generated_chiller_id] = generated_value
-
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "chillers[*]",
-                    f"chillers[?(@.id == '{reference_chiller_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_chiller_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_chiller_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "heat_rejections[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_heat_rejections = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("heat_rejections")) + 1
-            ],
-            generated_json,
-        )
-        generated_heat_rejection_ids = [
-            heat_rejection["id"] for heat_rejection in generated_heat_rejections
-        ]
-
-        for generated_heat_rejection in generated_heat_rejections:
-            generated_heat_rejection_id = generated_heat_rejection["id"]
-            reference_heat_rejection_id = object_id_map.get(generated_heat_rejection_id)
-
-            if not reference_heat_rejection_id:
-                continue
-
-            heat_rejection_data_path = json_key_path[json_key_path.index("].", json_key_path.index("heat_rejections")) + 2:]
-            generated_value = find_one(
-                heat_rejection_data_path, generated_heat_rejection
-            )
-            aligned_generated_values[generated_heat_rejection_id] = generated_value
-
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "heat_rejections[*]",
-                    f"heat_rejections[?(@.id == '{reference_heat_rejection_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_heat_rejection_id] = (
-                aligned_reference_value
-            )
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_heat_rejection_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "fluid_loops[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_fluid_loops = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("fluid_loops")) + 1
-            ],
-            generated_json,
-        )
-        generated_fluid_loop_ids = [
-            fluid_loop["id"] for fluid_loop in generated_fluid_loops
-        ]
-
-        for generated_fluid_loop in generated_fluid_loops:
-            generated_fluid_loop_id = generated_fluid_loop["id"]
-            reference_fluid_loop_id = object_id_map.get(generated_fluid_loop_id)
-
-            if not reference_fluid_loop_id:
-                continue
-
-            fluid_loop_data_path = json_key_path[json_key_path.index("].", json_key_path.index("fluid_loops")) + 2:]
-            generated_value = find_one(fluid_loop_data_path, generated_fluid_loop)
-            aligned_generated_values[generated_fluid_loop_id] = generated_value
-
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "fluid_loops[*]",
-                    f"fluid_loops[?(@.id == '{reference_fluid_loop_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_fluid_loop_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_fluid_loop_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
-
-    elif "pumps[" in json_key_path:
-        aligned_generated_values = {}
-        aligned_reference_values = {}
-
-        generated_pumps = find_all(
-            json_key_path[
-                : json_key_path.index("].", json_key_path.index("pumps")) + 1
-            ],
-            generated_json,
-        )
-        generated_pump_ids = [pump["id"] for pump in generated_pumps]
-
-        for generated_pump in generated_pumps:
-            generated_pump_id = generated_pump["id"]
-            reference_pump_id = object_id_map.get(generated_pump_id)
-
-            if isinstance(reference_pump_id, dict):
-                reference_pump_id = reference_pump_id.get("id")
-
-            if not reference_pump_id:
-                continue
-
-            pump_data_path = json_key_path[json_key_path.index("].", json_key_path.index("pumps")) + 2:]
-            generated_value = find_one(pump_data_path, generated_pump)
-            aligned_generated_values[generated_pump_id] = generated_value
-
-            aligned_reference_value = find_one(
-                json_key_path.replace(
-                    "pumps[*]",
-                    f"pumps[?(@.id == '{reference_pump_id}')]",
-                ),
-                reference_json,
-                None,
-            )
-
-            aligned_reference_values[generated_pump_id] = aligned_reference_value
-
-        if all(value is None for value in aligned_generated_values.values()):
-            notes = f"Missing key {json_key_path.split('.')[-1]}"
-            add_test_result(
-                specification_test,
-                None,
-                None,
-                TestOutcomeOptions.NOT_IMPLEMENTED.value,
-            )
-            warnings.append(notes)
-            return warnings, errors
-
-        general_comparison_warnings, general_comparison_errors = compare_json_values(
-            path_spec,
-            aligned_generated_values,
-            aligned_reference_values,
-            generated_pump_ids,
-            specification_test,
-            object_id_map,
-        )
-        errors.extend(general_comparison_errors)
+    errors.extend(general_comparison_errors)
 
     return warnings, errors
 
 
 def handle_unordered_comparisons(
-    path_spec, reference_json, generated_json, specification_test, object_id_map
+    path_spec,
+    reference_json,
+    generated_json,
+    specification_test,
+    object_id_map,
+    generated_index=None,
+    reference_index=None,
 ):
     json_key_path = path_spec["json-key-path"]
     compare_value = path_spec.get("compare-value", True)
 
+    if generated_index is None:
+        generated_index = RPDIndex(generated_json)
+    if reference_index is None:
+        reference_index = RPDIndex(reference_json)
+
     specification_test["evaluation_criteria"] = (
         EvaluationCriteriaOptions.VALUE.value
         if compare_value
@@ -1310,20 +836,11 @@ def handle_unordered_comparisons(
     warnings = []
     errors = []
     # The order will be the same for the generated and reference values, or the order does not matter in the tests
-    if ".".join(json_key_path.split(".")[:-1]) == "$":
-        generated_value_parents = [generated_json]
-    else:
-        generated_value_parents = find_all(
-            ".".join(json_key_path.split(".")[:-1]), generated_json
-        )
-    generated_value_parent_ids = [
-        # Important to use get() here to avoid key errors where objects have no ID such as weather
-        value.get("id")
-        for value in generated_value_parents
-    ]
-    generated_values = find_all(json_key_path, generated_json)
-    generated_values = {index: value for index, value in enumerate(generated_values)}
-    reference_values = find_all(json_key_path, reference_json)
+    generated_matches = generated_index.find_all_with_context(json_key_path)
+    # Each value is paired with the id of its own parent by the traversal
+    generated_value_parent_ids = [match.parent_id for match in generated_matches]
+    generated_values = {index: match.value for index, match in enumerate(generated_matches)}
+    reference_values = reference_index.find_all(json_key_path)
     reference_values = {index: value for index, value in enumerate(reference_values)}
 
     if all(value is None for value in generated_values):
@@ -1344,6 +861,8 @@ def handle_unordered_comparisons(
         generated_value_parent_ids,
         specification_test,
         object_id_map,
+        generated_index,
+        reference_index,
     )
     warnings.extend(general_comparison_warnings)
     errors.extend(general_comparison_errors)
@@ -1351,27 +870,132 @@ def handle_unordered_comparisons(
     return warnings, errors
 
 
+class AlignedFamily(NamedTuple):
+    """
+    How the objects of a collection are aligned through the object map by handle_ordered_comparisons().
+
+    The objects are aligned by the map of the family whose MappingFamily lists the collection.
+    """
+    # Whether generated objects without a mapped reference object are left out of the comparison
+    skip_unmapped: bool = True
+    # Whether the warnings from comparing the aligned values are reported
+    report_warnings: bool = False
+    # Collections nested within this one, whose objects are aligned instead when a spec path reaches into them
+    nested_collections: tuple = ()
+
+
+# Collections whose objects are aligned through the object map, in the order spec paths are matched against them
+ALIGNED_FAMILIES = {
+    "zones": AlignedFamily(skip_unmapped=False, nested_collections=("surfaces", "terminals")),
+    "surfaces": AlignedFamily(skip_unmapped=False, report_warnings=True),
+    "terminals": AlignedFamily(skip_unmapped=False, report_warnings=True),
+    "constructions": AlignedFamily(),
+    "materials": AlignedFamily(),
+    "heating_ventilating_air_conditioning_systems": AlignedFamily(),
+    "boilers": AlignedFamily(),
+    "chillers": AlignedFamily(),
+    "heat_rejections": AlignedFamily(),
+    "fluid_loops": AlignedFamily(),
+    "pumps": AlignedFamily(),
+}
+
+
+def get_aligned_collection(json_key_path):
+    """Returns the collection whose objects are aligned through the object map for a spec path, or None."""
+    for collection, aligned_family in ALIGNED_FAMILIES.items():
+        if f"{collection}[" in json_key_path and not any(
+            f"{nested_collection}[" in json_key_path for nested_collection in aligned_family.nested_collections
+        ):
+            return collection
+
+    return None
+
+
+def get_required_families(json_test_key_paths):
+    """Returns the object families whose maps the comparisons of a spec align objects with."""
+    families = set()
+    for path_spec in json_test_key_paths:
+        if path_spec.get("special-case") == "azimuth":
+            families.add("surfaces")
+        elif not path_spec.get("special-case"):
+            collection = get_aligned_collection(path_spec["json-key-path"])
+            if collection:
+                families.add(COLLECTION_FAMILIES[collection])
+    return families
+
+
+def get_prefetch_paths(json_test_key_paths):
+    """Returns the paths evaluated from the root of the generated and reference RPDs when running a spec."""
+    generated_paths = []
+    reference_paths = []
+
+    for path_spec in json_test_key_paths:
+        json_key_path = path_spec["json-key-path"]
+        if path_spec.get("special-case"):
+            continue
+
+        collection = get_aligned_collection(json_key_path)
+        if collection:
+            # Ordered comparisons look up the generated objects of the collection
+            generated_paths.append(
+                json_key_path[: json_key_path.index("].", json_key_path.index(collection)) + 1]
+            )
+        else:
+            # Unordered comparisons walk the generated values with their parents, and look up the reference values
+            reference_paths.append(json_key_path)
+
+    return generated_paths, reference_paths
+
+
 def run_file_comparison(
-    spec_file, generated_json_file, reference_json_file, test_case_report
+    spec_file, generated_json_file, reference_json_file, test_case_report, cache_dir=None, mapping_executor=None
 ):
-    """Compares generated and reference JSON files according to the spec."""
+    """
+    Compares generated and reference JSON files according to the spec.
+    When a cache_dir is given, the parsed reference RPD, its index and the object map are cached there between runs.
+    When a mapping_executor is given, object families that do not rely on each other are mapped concurrently.
+    """
     spec = load_json_file(spec_file)
     json_test_key_paths = spec.get("json-test-key-paths", [])
 
-    generated_json = load_json_file(generated_json_file)
-    reference_json = load_json_file(reference_json_file)
+    # Large arrays that no spec path reads, such as hourly schedule values, are left unparsed
+    required_keys = get_required_keys(path_spec["json-key-path"] for path_spec in json_test_key_paths)
+    generated_json = load_rpd(generated_json_file, required_keys)
+    generated_index = RPDIndex(generated_json)
+    if cache_dir is None:
+        reference_json = load_rpd(reference_json_file, required_keys)
+        reference_index = RPDIndex(reference_json)
+        map_cache = None
+    else:
+        reference_json, reference_index = load_cached_rpd(reference_json_file, required_keys, cache_dir)
+        map_cache = load_object_map_cache(
+            Path(reference_json_file).stem, generated_json, reference_json_file, cache_dir
+        )
 
     warnings = []
     errors = []
 
     object_id_map, map_warnings, map_errors = map_objects(
-        generated_json, reference_json
+        generated_json, reference_json, generated_index, reference_index, mapping_executor, map_cache
     )
     warnings.extend(map_warnings)
     errors.extend(map_errors)
     if not object_id_map:
+        if map_cache is not None:
+            map_cache.save()
+            save_cached_rpd(reference_index, reference_json_file, required_keys, cache_dir)
         return warnings, errors
 
+    # Map the object families the spec compares up front, so their mapping errors are reported first
+    object_id_map.require(get_required_families(json_test_key_paths))
+    errors.extend(object_id_map.errors[len(map_errors):])
+    reported_map_error_count = len(object_id_map.errors)
+
+    # Find the objects and values for every spec path in one walk of each RPD
+    generated_paths, reference_paths = get_prefetch_paths(json_test_key_paths)
+    generated_index.prefetch(generated_paths)
+    reference_index.prefetch(reference_paths)
+
     # Once maps have been defined, iterate through the test specs
     for path_spec in json_test_key_paths:
         json_key_path = path_spec["json-key-path"]
@@ -1388,6 +1012,8 @@ def run_file_comparison(
                 generated_json,
                 reference_json,
                 specification_test,
+                generated_index,
+                reference_index,
             )
             warnings.extend(special_case_warnings)
             errors.extend(special_case_errors)
@@ -1396,22 +1022,7 @@ def run_file_comparison(
         else:
 
             # Handle comparison of data derived from objects which may not be in the same order as the reference objects
-            if any(
-                group in json_key_path
-                for group in [
-                    "constructions[",
-                    "materials[",
-                    "zones[",
-                    "surfaces[",
-                    "terminals[",
-                    "heating_ventilating_air_conditioning_systems[",
-                    "boilers[",
-                    "chillers[",
-                    "heat_rejections[",
-                    "fluid_loops[",
-                    "pumps[",
-                ]
-            ):
+            if get_aligned_collection(json_key_path):
                 (
                     ordered_comparison_warnings,
                     ordered_comparison_errors,
@@ -1421,6 +1032,8 @@ def run_file_comparison(
                     reference_json,
                     generated_json,
                     specification_test,
+                    reference_index,
+                    generated_index,
                 )
                 warnings.extend(ordered_comparison_warnings)
                 errors.extend(ordered_comparison_errors)
@@ -1436,59 +1049,132 @@ def run_file_comparison(
                     generated_json,
                     specification_test,
                     object_id_map,
+                    generated_index,
+                    reference_index,
                 )
                 warnings.extend(unordered_comparison_warnings)
                 errors.extend(unordered_comparison_errors)
 
+    # Report errors from any object families that were only mapped when the comparisons looked up their ids
+    errors.extend(object_id_map.errors[reported_map_error_count:])
+    if map_cache is not None:
+        map_cache.save()
+        save_cached_rpd(reference_index, reference_json_file, required_keys, cache_dir)
+
     return warnings, errors
 
 
-def run_comparison_for_all_tests(test_dir: Path):
-    """Runs JSON comparison for all test cases in the test directory."""
-    reference_dir = test_dir.parent / "reference_rpds"
-    spec_dir = test_dir.parent / "comparison_specs"
+def run_test_case(test_case_dir: Path, cache_dir=None, mapping_executor=None):
+    """
+    Runs the JSON comparison for a single test case directory, printing its progress and results.
 
-    total_errors = 0
+    Returns
+    -------
+    tuple: (test case report, or None if the test case was skipped, number of errors)
+    """
+    reference_dir = test_case_dir.parent.parent / "reference_rpds"
+    spec_dir = test_case_dir.parent.parent / "comparison_specs"
+    test = test_case_dir.name
 
-    for test_case_dir in test_dir.iterdir():
-        if not test_case_dir.is_dir():
-            continue
+    generated_json_file = next(
+        (f for f in test_case_dir.iterdir() if f.suffix == ".rpd"), None
+    )
+    if not generated_json_file:
+        return None, 0
 
-        test = test_case_dir.name
+    spec_file = spec_dir / f"{test} spec.json"
+    reference_json_file = reference_dir / f"{test}.rpd"
 
-        generated_json_file = next(
-            (f for f in test_case_dir.iterdir() if f.suffix == ".rpd"), None
+    if not (
+        generated_json_file.is_file()
+        and spec_file.is_file()
+        and reference_json_file.is_file()
+    ):
+        print(
+            f"Skipping {test} because it does not contain the required files."
         )
-        if not generated_json_file:
-            continue
+        return None, 0
 
-        spec_file = spec_dir / f"{test} spec.json"
-        reference_json_file = reference_dir / f"{test}.rpd"
+    test_case_report = create_test_case_report(
+        test_case_dir, generated_json_file.name
+    )
+    print(f"Running comparison for {test}...")
+    warnings, errors = run_file_comparison(
+        spec_file,
+        generated_json_file,
+        reference_json_file,
+        test_case_report,
+        cache_dir,
+        mapping_executor,
+    )
+    print_results(test, warnings, errors)
+    return test_case_report, len(errors)
+
+
+def run_test_case_or_report_failure(test_case_dir: Path, cache_dir=None):
+    """
+    Runs a test case like run_test_case(). An exception raised by the test case is printed with its traceback and
+    counted as one error instead of stopping the remaining test cases.
+    """
+    try:
+        return run_test_case(test_case_dir, cache_dir)
+    except Exception:
+        print(f"Comparison for {test_case_dir.name} failed:")
+        traceback.print_exc(file=sys.stdout)
+        return None, 1
+
+
+def run_test_case_in_worker(test_case_dir: Path, cache_dir=None):
+    """Runs a test case in a worker process, returning its printed output along with its report and error count."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        test_case_report, error_count = run_test_case_or_report_failure(test_case_dir, cache_dir)
+    return test_case_report, error_count, output.getvalue()
+
+
+def run_comparison_for_all_tests(test_dir: Path, jobs=1, mapping_jobs=1, cache_dir=None):
+    """
+    Runs JSON comparison for all test cases in the test directory.
+
+    With jobs greater than 1, test cases are run in that many worker processes. Their output and reports are
+    merged in the same order as a serial run, so the results are identical. A test case that raises an exception
+    in a worker is reported as failed with its traceback and the remaining test cases still run, whereas a serial
+    run stops at the exception.
+    Otherwise, with mapping_jobs greater than 1, the object families of each test case are mapped in that many
+    worker processes.
+    When a cache_dir is given, the parsed reference RPDs, their indexes and the object maps are cached there between
+    runs.
+    """
+    test_case_dirs = [
+        test_case_dir for test_case_dir in test_dir.iterdir() if test_case_dir.is_dir()
+    ]
 
-        if (
-            generated_json_file.is_file()
-            and spec_file.is_file()
-            and reference_json_file.is_file()
-        ):
+    total_errors = 0
 
-            test_case_report = add_test_case_report(
-                test_case_dir, generated_json_file.name
-            )
-            print(f"Running comparison for {test}...")
-            warnings, errors = run_file_comparison(
-                spec_file,
-                generated_json_file,
-                reference_json_file,
-                test_case_report,
-            )
-            print_results(test, warnings, errors)
-            total_errors += len(errors)
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(run_test_case_in_worker, test_case_dir, cache_dir)
+                for test_case_dir in test_case_dirs
+            ]
+            for future in futures:
+                test_case_report, error_count, output = future.result()
+                sys.stdout.write(output)
+                if test_case_report is not None:
+                    results_data["test_case_reports"].append(test_case_report)
+                total_errors += error_count
 
-        else:
-            print(
-                f"Skipping {test} because it does not contain the required files."
-            )
-            continue
+    else:
+        mapping_executor = ProcessPoolExecutor(max_workers=mapping_jobs) if mapping_jobs > 1 else None
+        try:
+            for test_case_dir in test_case_dirs:
+                test_case_report, error_count = run_test_case(test_case_dir, cache_dir, mapping_executor)
+                if test_case_report is not None:
+                    results_data["test_case_reports"].append(test_case_report)
+                total_errors += error_count
+        finally:
+            if mapping_executor is not None:
+                mapping_executor.shutdown()
 
     save_to_json_file()
 
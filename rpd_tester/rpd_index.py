@@ -0,0 +1,350 @@
+from collections.abc import Hashable
+from typing import NamedTuple
+
+import numpy as np
+
+from rpd_tester.path_engine import (
+    apply_operations,
+    compile_filter_predicate,
+    compile_path,
+    find_all_paths,
+    parse_filter_condition,
+    parse_path_segment,
+)
+from rpd_tester.schedules import ScheduleFingerprint, get_hourly_values, get_schedule_fingerprint
+
+
+class IndexedObject(NamedTuple):
+    obj: dict
+    parent: dict | None
+    collection: str | None
+    path: str
+
+
+# Zones whose surfaces are mapped and compared, as selected by get_zones_from_json()
+ZONES_PATH = "$.ruleset_model_descriptions[*].buildings[*].building_segments[*].zones[*]"
+
+
+class SurfaceGraph:
+    """
+    Adjacency of the zones and surfaces of an RPD, built in a single pass over the surfaces of its zones.
+
+    owned_surfaces maps each zone id to the surfaces of that zone, adjacent_surfaces maps each zone id to
+    the surfaces of any zone whose adjacent_zone is that zone, and surface_zones maps each surface id to
+    the zone that owns it. Surfaces are listed in document order.
+    """
+
+    def __init__(self, zones):
+        self.owned_surfaces: dict[str, list[dict]] = {}
+        self.adjacent_surfaces: dict[str, list[dict]] = {}
+        self.surface_zones: dict[str, dict] = {}
+
+        for zone in zones:
+            if not isinstance(zone, dict):
+                continue
+            surfaces = zone.get("surfaces")
+            surfaces = [surface for surface in surfaces if isinstance(surface, dict)] if isinstance(surfaces, list) else []
+            self.owned_surfaces.setdefault(zone.get("id"), surfaces)
+
+            for surface in surfaces:
+                self.surface_zones.setdefault(surface.get("id"), zone)
+                if "adjacent_zone" in surface and isinstance(surface["adjacent_zone"], Hashable):
+                    self.adjacent_surfaces.setdefault(surface["adjacent_zone"], []).append(surface)
+
+
+class RPDIndex:
+    """
+    Index of every object with an id in an RPD, built in a single traversal of the document.
+
+    Each object is recorded with its parent object, the name of the collection that owns it
+    (e.g. "zones", "surfaces", "terminals", "boilers") and its concrete JSON path.
+
+    Secondary indexes on (collection, field, value) are built lazily the first time a filtered query needs them.
+    The document is assumed not to change after it has been indexed.
+    """
+
+    def __init__(self, rpd: dict):
+        self.rpd = rpd
+        # Object id -> every object with that id, in document order
+        self.objects: dict[str, list[IndexedObject]] = {}
+        # Collection name -> every object held in a list under that key, in document order
+        self.collections: dict[str, list[IndexedObject]] = {}
+        # Collection name -> ids of the objects holding a list of objects under that key
+        self.collection_owners: dict[str, set[int]] = {}
+        # (collection, field) -> field value -> id of the owning object -> matching objects, in document order
+        self.field_indexes: dict[tuple[str, str], dict] = {}
+        # Path string -> query plan, or None when the path has no filter that an index can serve
+        self.query_plans: dict[str, tuple | None] = {}
+        # Path string -> values matched from the root of the RPD, filled by prefetch()
+        self.path_results: dict[str, list] = {}
+        # Schedule id -> hourly values as an array of floats, or None, parsed the first time they are compared
+        self.schedule_hourly_values: dict[str, np.ndarray | None] = {}
+        # Schedule id -> ScheduleFingerprint of its hourly values, or None, computed the first time it is compared
+        self.schedule_fingerprints: dict[str, ScheduleFingerprint | None] = {}
+        # Whether state kept in the pickled index, such as schedule fingerprints, was added since it was built or loaded
+        self.changed = False
+        self._surface_graph = None
+
+        self._index_object(rpd, None, None, "$")
+
+    def __getstate__(self):
+        # Indexes keyed by id() and compiled query plans cannot be restored from a pickle, so only the
+        # document, its object and collection indexes and any schedule fingerprints are kept
+        return {
+            "rpd": self.rpd,
+            "objects": self.objects,
+            "collections": self.collections,
+            "schedule_fingerprints": self.schedule_fingerprints,
+        }
+
+    def __setstate__(self, state):
+        self.rpd = state["rpd"]
+        self.objects = state["objects"]
+        self.collections = state["collections"]
+        self.collection_owners = {}
+        for collection, entries in self.collections.items():
+            self.collection_owners[collection] = {id(entry.parent) for entry in entries}
+        self.field_indexes = {}
+        self.query_plans = {}
+        self.path_results = {}
+        self.schedule_hourly_values = {}
+        self.schedule_fingerprints = state["schedule_fingerprints"]
+        self.changed = False
+        self._surface_graph = None
+
+    @property
+    def surface_graph(self):
+        """The SurfaceGraph of the zones at ZONES_PATH, built the first time it is used."""
+        if self._surface_graph is None:
+            self._surface_graph = SurfaceGraph(compile_path(ZONES_PATH).find_all(self.rpd))
+        return self._surface_graph
+
+    def _index_object(self, obj, parent, collection, path):
+        object_id = obj.get("id")
+        if isinstance(object_id, str):
+            self.objects.setdefault(object_id, []).append(
+                IndexedObject(obj, parent, collection, path)
+            )
+
+        for key, value in obj.items():
+            if isinstance(value, dict):
+                self._index_object(value, obj, key, f"{path}.{key}")
+
+            elif isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, dict):
+                        self.collection_owners.setdefault(key, set()).add(id(obj))
+                        item_path = f"{path}.{key}[{i}]"
+                        self.collections.setdefault(key, []).append(
+                            IndexedObject(item, obj, key, item_path)
+                        )
+                        self._index_object(item, obj, key, item_path)
+
+    def get(self, object_id, collection=None, default=None):
+        """Returns the first object with the given id, optionally restricted to a collection."""
+        for entry in self.objects.get(object_id, []):
+            if collection is None or entry.collection == collection:
+                return entry.obj
+        return default
+
+    def get_hourly_values(self, schedule_id):
+        """Returns the hourly values of the schedule with the given id as an array of floats, or None."""
+        if schedule_id not in self.schedule_hourly_values:
+            self.schedule_hourly_values[schedule_id] = get_hourly_values(self.get(schedule_id, "schedules"))
+        return self.schedule_hourly_values[schedule_id]
+
+    def get_schedule_fingerprint(self, schedule_id):
+        """Returns the ScheduleFingerprint of the schedule with the given id, or None if it has no hourly values."""
+        if schedule_id not in self.schedule_fingerprints:
+            self.schedule_fingerprints[schedule_id] = get_schedule_fingerprint(self.get_hourly_values(schedule_id))
+            self.changed = True
+        return self.schedule_fingerprints[schedule_id]
+
+    def get_entry(self, object_id, collection=None):
+        """Returns the IndexedObject for the first object with the given id, optionally restricted to a collection."""
+        for entry in self.objects.get(object_id, []):
+            if collection is None or entry.collection == collection:
+                return entry
+        return None
+
+    def field_index(self, collection, field):
+        """Returns the objects of a collection grouped by the value of a field and then by owning object."""
+        field_index = self.field_indexes.get((collection, field))
+
+        if field_index is None:
+            field_index = {}
+            for entry in self.collections.get(collection, []):
+                value = entry.obj.get(field)
+                if field in entry.obj and isinstance(value, Hashable):
+                    field_index.setdefault(value, {}).setdefault(id(entry.parent), []).append(entry.obj)
+            self.field_indexes[(collection, field)] = field_index
+
+        return field_index
+
+    def plan_query(self, jpath):
+        """
+        Plans a query for a path with an equality filter applied directly to a collection,
+        such as "zones[*].surfaces[?(@.adjacent_to == 'EXTERIOR')].area".
+
+        Returns
+        -------
+        tuple | None: (compiled path, position of the collection key, position after the filter, collection, checks),
+        or None when the path should be evaluated by walking the document
+        """
+        if jpath in self.query_plans:
+            return self.query_plans[jpath]
+
+        compiled = compile_path(jpath)
+        steps = compiled.steps
+        plan = None
+
+        for i, (op_type, collection) in enumerate(steps):
+            if op_type != "key":
+                continue
+
+            # Allow both "surfaces[?(...)]" and "surfaces[*][?(...)]"
+            filter_position = i + 2 if steps[i + 1:i + 2] == (("index", "*"),) else i + 1
+            if filter_position < len(steps) and steps[filter_position][0] == "filter":
+                checks = parse_filter_condition(steps[filter_position][1])
+                if checks:
+                    plan = (compiled, i, filter_position + 1, collection.split("==")[0], checks)
+                break
+
+        self.query_plans[jpath] = plan
+        return plan
+
+    def select_from_collection(self, owners, collection, checks, fallback_operations):
+        """
+        Selects the objects of each owner's collection that satisfy every (field, value) check.
+
+        For each owner the lookup is routed through the field index whose value matches the fewest of its objects.
+        Owners whose collection was not indexed as a list of objects are evaluated with the fallback operations instead.
+        """
+        indexed_owners = self.collection_owners.get(collection, set())
+        if all(isinstance(value, Hashable) for _, value in checks):
+            buckets = [self.field_index(collection, field).get(value, {}) for field, value in checks]
+        else:
+            # Unhashable values cannot be looked up in an index
+            indexed_owners = set()
+
+        results = []
+        for owner in owners:
+            if not isinstance(owner, dict) or collection not in owner:
+                continue
+
+            if id(owner) in indexed_owners and isinstance(owner[collection], list):
+                candidates = min((bucket.get(id(owner), []) for bucket in buckets), key=len)
+                results.extend(
+                    candidate
+                    for candidate in candidates
+                    if all(field in candidate and candidate[field] == value for field, value in checks)
+                )
+            else:
+                results.extend(apply_operations(fallback_operations, [owner[collection]]))
+
+        return results
+
+    def prefetch(self, jpaths):
+        """Evaluates every path from the root of the RPD in a single walk and keeps the results for find_all."""
+        jpaths = [jpath for jpath in dict.fromkeys(jpaths) if jpath not in self.path_results]
+        self.path_results.update(find_all_paths(jpaths, self.rpd))
+
+    def find_all(self, jpath, obj=None):
+        """
+        Returns the same values as find_all(jpath, obj), routing equality filters on collections
+        to the secondary indexes instead of scanning every object of the collection.
+
+        obj defaults to the indexed RPD and may be any object within it. Paths that were prefetched
+        from the root of the RPD are answered from the prefetched results.
+        """
+        if obj is None:
+            obj = self.rpd
+
+        if obj is self.rpd and jpath in self.path_results:
+            return list(self.path_results[jpath])
+
+        plan = self.plan_query(jpath)
+        if plan is None:
+            return compile_path(jpath).find_all(obj)
+
+        compiled, key_position, rest_position, collection, checks = plan
+        owners = apply_operations(compiled.operations[:key_position], [obj])
+        matches = self.select_from_collection(
+            owners, collection, checks, compiled.operations[key_position + 1:rest_position]
+        )
+        return apply_operations(compiled.operations[rest_position:], matches)
+
+    def find_all_with_context(self, jpath, obj=None):
+        """Returns a PathMatch for every value matched by jpath in obj, which defaults to the indexed RPD."""
+        return compile_path(jpath).find_all_with_context(self.rpd if obj is None else obj)
+
+    def compile_aligned_object_lookup(self, collection_path, collection):
+        """
+        Compiles a lookup for the objects of a collection selected by a path, by object id.
+
+        Parameters
+        ----------
+        collection_path: str
+        A path ending in the collection, such as "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*]"
+        or "$.ruleset_model_descriptions[0].fluid_loops[?(@.type == 'COOLING')]"
+        collection: str
+        The name of the collection at the end of collection_path, e.g. "zones"
+
+        Returns
+        -------
+        function: maps an object id to the list of matching objects, in document order
+        """
+        collection_start = collection_path.index(collection)
+        owner_path = collection_path[:collection_start].rstrip(".")
+
+        # Only objects held by the owners selected by the path are candidates
+        owners = [self.rpd] if owner_path == "$" else compile_path(owner_path).find_all(self.rpd)
+        owner_ids = {id(owner) for owner in owners}
+
+        # Index and filter operations on the collection itself must also hold for the aligned object
+        checks = []
+        for op_type, value in parse_path_segment(collection_path[collection_start:]):
+            if op_type == "filter":
+                predicate = compile_filter_predicate(value)
+                checks.append(lambda entry, predicate=predicate: predicate(entry.obj))
+            elif op_type == "index" and value != "*":
+                suffix = f"[{value}]"
+                checks.append(lambda entry, suffix=suffix: entry.path.endswith(suffix))
+
+        def lookup(object_id):
+            return [
+                entry.obj
+                for entry in self.objects.get(object_id, [])
+                if entry.collection == collection
+                and id(entry.parent) in owner_ids
+                and all(check(entry) for check in checks)
+            ]
+
+        return lookup
+
+    def compile_aligned_lookup(self, json_key_path, collection):
+        """
+        Compiles a lookup for the value at json_key_path belonging to a specific object of the collection.
+
+        Parameters
+        ----------
+        json_key_path: str
+        A spec path such as "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].volume"
+        collection: str
+        The collection within json_key_path whose objects are aligned by id, e.g. "zones"
+
+        Returns
+        -------
+        function: maps an object id to the first value found at the remainder of the path for that object, or None
+        """
+        collection_end = json_key_path.index("].", json_key_path.index(collection)) + 1
+        find_objects = self.compile_aligned_object_lookup(json_key_path[:collection_end], collection)
+        data_path = compile_path(json_key_path[collection_end + 1:])
+
+        def lookup(object_id):
+            for obj in find_objects(object_id):
+                for value in data_path.iter_all(obj):
+                    return value
+            return None
+
+        return lookup
@@ -0,0 +1,171 @@
+import json
+import re
+from collections.abc import Sequence
+
+from rpd_tester.path_engine import compile_path
+
+# Flat arrays shorter than this many characters of JSON text are always parsed
+SKIP_ARRAY_MIN_LENGTH = 4096
+
+# Whitespace and the colon between a key and its value
+KEY_SEPARATOR_PATTERN = re.compile(rb"\s*:\s*")
+
+# The whitespace characters of JSON
+WHITESPACE = b" \t\n\r"
+
+# Marker for a skipped array, written to the JSON text as an escaped string so it cannot clash with RPD data
+SKIPPED_MARKER = "\x00skipped:"
+
+
+class SkippedArray(Sequence):
+    """
+    Placeholder for a flat array that was not parsed when its RPD was loaded, such as the 8760 hourly_values
+    of a schedule. The raw JSON text is kept and parsed the first time the array's elements are needed.
+    """
+
+    __slots__ = ("text", "_values")
+
+    def __init__(self, text):
+        self.text = text
+        self._values = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = json.loads(self.text)
+        return self._values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __eq__(self, other):
+        if isinstance(other, SkippedArray):
+            other = other.values
+        return self.values == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"SkippedArray({len(self.text)} characters)"
+
+
+def get_required_keys(jpaths):
+    """Returns the names of every key used by the given paths, including the fields of their filters."""
+    required_keys = set()
+    for jpath in jpaths:
+        for op_type, value in compile_path(jpath).steps:
+            if op_type == "key":
+                required_keys.add(value.split("==")[0])
+            elif op_type == "filter":
+                required_keys.update(re.findall(r"@\.(\w+)", value))
+    return required_keys
+
+
+def find_string_end(text, quote):
+    """Returns the position just after the JSON string whose opening quote is at the given position."""
+    end = text.find(b'"', quote + 1)
+    while end != -1:
+        backslash = end - 1
+        while text[backslash] == ord("\\"):
+            backslash -= 1
+        # A quote preceded by an odd number of backslashes is escaped
+        if (end - backslash) % 2:
+            return end + 1
+        end = text.find(b'"', end + 1)
+    return len(text)
+
+
+def iter_array_starts(text):
+    """
+    Yields the (position, key) of each opening bracket of JSON text that is outside a string, where key is the
+    key whose value the array is, or None for an array within an array.
+    """
+    position = 0
+    # (start, end) of the last string before the bracket, which is the array's key if only a colon separates them
+    last_string = None
+    start = text.find(b"[")
+    while start != -1:
+        quote = text.find(b'"', position, start)
+        if quote != -1:
+            position = find_string_end(text, quote)
+            last_string = (quote, position)
+            if position > start:
+                start = text.find(b"[", position)
+            continue
+
+        key = None
+        if last_string is not None and KEY_SEPARATOR_PATTERN.fullmatch(text, last_string[1], start):
+            key = json.loads(text[last_string[0]:last_string[1]])
+        yield start, key
+        position = start + 1
+        start = text.find(b"[", position)
+
+
+def load_rpd(file_path, required_keys=None):
+    """
+    Loads an RPD, leaving large flat arrays under keys that are not required unparsed.
+
+    Parameters
+    ----------
+    file_path: str | Path
+    Path of the RPD file
+    required_keys: set | None
+    Names of the keys whose arrays must be parsed, e.g. from get_required_keys(). When None, the whole RPD is parsed.
+
+    Returns
+    -------
+    dict: the RPD, with each skipped array replaced by a SkippedArray
+    """
+    if required_keys is None:
+        with open(file_path, "r") as file:
+            return json.load(file)
+
+    # The text is scanned as bytes, so that it is only decoded once the skipped arrays have been cut out
+    with open(file_path, "rb") as file:
+        text = file.read()
+
+    skipped_arrays = []
+    skipped_keys = set()
+    chunks = []
+    position = 0
+
+    # Scan for flat arrays by their brackets outside strings; the text is only parsed as JSON once they have been
+    # cut out
+    for start, key in iter_array_starts(text):
+        if key is None or key in required_keys:
+            continue
+        end = text.find(b"]", start)
+        if end == -1:
+            break
+
+        if (
+            end - start >= SKIP_ARRAY_MIN_LENGTH
+            and not any(text.find(char, start + 1, end) != -1 for char in (b"[", b"{", b'"'))
+        ):
+            skipped_keys.add(key)
+            chunks.append(text[position:start])
+            chunks.append(json.dumps(f"{SKIPPED_MARKER}{len(skipped_arrays)}").encode())
+            # Whitespace is dropped so that pretty-printed arrays stay small until they are parsed
+            skipped_arrays.append(text[start:end + 1].translate(None, WHITESPACE).decode())
+            position = end + 1
+
+    if not skipped_arrays:
+        # The bytes are released once decoded, so that the text is not held twice while it is parsed
+        text = text.decode()
+        return json.loads(text)
+    chunks.append(text[position:])
+    text = b"".join(chunks)
+    del chunks
+
+    def restore_placeholders(obj):
+        if not skipped_keys.isdisjoint(obj):
+            for key in skipped_keys.intersection(obj):
+                value = obj[key]
+                if isinstance(value, str) and value.startswith(SKIPPED_MARKER):
+                    obj[key] = SkippedArray(skipped_arrays[int(value[len(SKIPPED_MARKER):])])
+        return obj
+
+    return json.loads(text, object_hook=restore_placeholders)
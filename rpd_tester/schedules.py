@@ -0,0 +1,121 @@
+import hashlib
+import math
+import re
+from typing import NamedTuple
+
+import numpy as np
+
+from rpd_tester.rpd_loader import SkippedArray
+from rpd_tester.utils import isclose_array, is_real_number
+
+# Compacted JSON text of a flat array holding only numbers, which NumPy can parse directly
+NUMBER_ARRAY_PATTERN = re.compile(r"\[[-+0-9.eE,]*\]")
+
+
+class ScheduleComparison(NamedTuple):
+    """Summary of the comparison of the hourly values of a generated and a reference schedule."""
+    # Largest absolute difference between the generated and reference value of an hour
+    max_deviation: float
+    # Number of hours whose values differ by more than the tolerance, including hours only one schedule has
+    mismatched_hours: int
+    # Sums of the hourly values, i.e. the equivalent full-load hours of multiplier schedules
+    generated_full_load_hours: float
+    reference_full_load_hours: float
+
+    def describe(self):
+        return (
+            f"Mismatched hours: {self.mismatched_hours}; max deviation: {self.max_deviation:g}; "
+            f"equivalent full-load hours: expected {self.reference_full_load_hours:g}, "
+            f"got {self.generated_full_load_hours:g}"
+        )
+
+
+class ScheduleFingerprint(NamedTuple):
+    """Content hash and summary statistics of the hourly values of a schedule."""
+    # Hash of the hourly values as 64-bit floats, so equal values give equal digests however they were written
+    digest: str
+    hour_count: int
+    full_load_hours: float
+    min_value: float
+    max_value: float
+
+
+def get_schedule_fingerprint(hourly_values):
+    """Returns the ScheduleFingerprint of an array of hourly values, or None if there are none."""
+    if hourly_values is None:
+        return None
+    return ScheduleFingerprint(
+        digest=hashlib.blake2b(hourly_values.tobytes(), digest_size=16).hexdigest(),
+        hour_count=len(hourly_values),
+        full_load_hours=float(hourly_values.sum()),
+        min_value=float(hourly_values.min(initial=math.inf)),
+        max_value=float(hourly_values.max(initial=-math.inf)),
+    )
+
+
+def compare_fingerprints(generated_fingerprint, reference_fingerprint):
+    """
+    Returns the ScheduleComparison of two schedules whose fingerprints show identical hourly values, or None when
+    their hourly values must be compared element by element.
+    """
+    if (
+        generated_fingerprint is None
+        or reference_fingerprint is None
+        or generated_fingerprint.digest != reference_fingerprint.digest
+        # NaN is not equal to itself, so identical arrays holding NaN still differ
+        or math.isnan(generated_fingerprint.full_load_hours)
+    ):
+        return None
+    return ScheduleComparison(
+        max_deviation=0.0,
+        mismatched_hours=0,
+        generated_full_load_hours=generated_fingerprint.full_load_hours,
+        reference_full_load_hours=reference_fingerprint.full_load_hours,
+    )
+
+
+def get_hourly_values(schedule):
+    """Returns the hourly_values of a schedule as an array of floats, or None if it has no numeric hourly values."""
+    if not isinstance(schedule, dict):
+        return None
+
+    hourly_values = schedule.get("hourly_values")
+    if isinstance(hourly_values, SkippedArray) and NUMBER_ARRAY_PATTERN.fullmatch(hourly_values.text):
+        # Skipped arrays are parsed straight from their JSON text
+        return np.fromstring(hourly_values.text[1:-1], sep=",") if len(hourly_values.text) > 2 else np.zeros(0)
+
+    if not isinstance(hourly_values, (list, SkippedArray)) or not all(
+        is_real_number(value) for value in hourly_values
+    ):
+        return None
+    return np.array(hourly_values, dtype=float)
+
+
+def compare_hourly_values(generated_values, reference_values, tolerance=None):
+    """
+    Compares two arrays of hourly values in one vectorised pass.
+
+    Parameters
+    ----------
+    generated_values: np.ndarray
+    reference_values: np.ndarray
+    tolerance: float | None
+    Absolute tolerance of each hourly value; values must be equal without one
+
+    Returns
+    -------
+    ScheduleComparison
+    """
+    overlap = min(len(generated_values), len(reference_values))
+    generated_overlap = generated_values[:overlap]
+    reference_overlap = reference_values[:overlap]
+
+    matched = isclose_array(generated_overlap, reference_overlap, absolute_tolerance=tolerance or 0.0)
+    deviation = np.abs(generated_overlap - reference_overlap)
+
+    return ScheduleComparison(
+        max_deviation=float(np.nanmax(deviation, initial=0.0)),
+        mismatched_hours=int(overlap - np.count_nonzero(matched)) + abs(len(generated_values) - len(reference_values)),
+        generated_full_load_hours=float(generated_values.sum()),
+        reference_full_load_hours=float(reference_values.sum()),
+    )
@@ -1,11 +1,13 @@
 import re
-from jsonpath_ng.ext import parse
 import json
 import math
-from difflib import get_close_matches
 from itertools import chain
 from typing import TypedDict
 
+import numpy as np
+
+from rpd_tester.path_engine import compile_path, split_path
+
 
 class ZonesTerminalsServedByHVACSys(TypedDict):
     terminal_list: list[str]
@@ -28,182 +30,8 @@ def ensure_root(jpath):
     return jpath if jpath.startswith("$") else "$." + jpath
 
 
-def split_path(jpath):
-    # If the path starts with "$.", remove it
-    if jpath.startswith("$."):
-        jpath = jpath[2:]
-
-    result = []
-    current_segment = []
-    bracket_depth = 0
-
-    for char in jpath:
-        if char == "[":
-            bracket_depth += 1
-            current_segment.append(char)
-        elif char == "]":
-            bracket_depth -= 1
-            current_segment.append(char)
-        elif char == "." and bracket_depth == 0:
-            # We are at a top-level dot, split here
-            segment_str = "".join(current_segment).strip()
-            if segment_str:
-                result.append(segment_str)
-            current_segment = []
-        else:
-            current_segment.append(char)
-
-    # Add the last segment if it exists
-    segment_str = "".join(current_segment).strip()
-    if segment_str:
-        result.append(segment_str)
-    return result
-
-
 def find_all(jpath, obj):
-    # Regex to identify array index patterns like [*], [0], [1], etc.
-    bracket_pattern = re.compile(r"\[([^]]*)]")
-
-    def parse_path_segment(segment):
-        """
-        Given a path segment (like "surfaces[*][?(@.adjacent_to == 'EXTERIOR')]"),
-        split it into a list of operations:
-
-        For example:
-        "surfaces[*][?(@.adjacent_to == 'EXTERIOR')]" ->
-        [("key", "surfaces"), ("index", "*"), ("filter", "@.adjacent_to == 'EXTERIOR'")]
-        """
-        parts = []
-        m = bracket_pattern.split(segment)
-        base_key = m[0]
-        if base_key:
-            parts.append(("key", base_key))
-
-        for i in range(1, len(m)):
-            content = m[i].strip()
-            if content == "":
-                continue
-            if content.startswith("?(") and content.endswith(")"):
-                # Filter condition
-                condition = content[2:-1].strip()
-                parts.append(("filter", condition))
-            else:
-                parts.append(("index", content))
-
-        return parts
-
-    def evaluate_filter_condition(obj_inst, condition_str):
-        """
-        Evaluate a filter condition string against obj.
-        Conditions can have `@.field == "value"` format
-        and multiple conditions joined by "and".
-
-        Handle @.field references, equality checks, and string values.
-        """
-
-        # Filter conditions look like: @.field == 'value'
-        condition_str = condition_str.replace("==", "=")
-
-        # Split by ' and ' to handle multiple conditions
-        conditions = [c.strip() for c in condition_str.split(" and ")]
-
-        def evaluate_single_condition(cond):
-            # Pattern: @.field = 'value'
-            match = re.match(r'@\.(\w+)\s*=\s*(["\'])(.*?)\2', cond)
-            if not match:
-                # If parsing fails, skip this condition (return False)
-                return False
-            field, _, value = match.groups()
-            # Check if field is in (obj_inst and equals value
-            return (field in obj_inst) and (obj_inst[field] == value)
-
-        # All conditions must be True
-        return all(evaluate_single_condition(c) for c in conditions)
-
-    def recursive_find(parts, current_obj):
-        """
-        parts is a list of segments, each segment is a list of operations like:
-        [("key","ruleset_model_descriptions"),("index","*")]
-        Process them step-by-step.
-        """
-        if not parts:
-            return [current_obj]
-
-        segment = parts[0]
-        results = [current_obj]
-
-        for op_type, value in segment:
-            key = value.split("[")[0].split("==")[0]
-            new_results = []
-            if op_type == "key":
-                # For each object in results, fetch the value for the given key if it's a dict
-                for r in results:
-                    if isinstance(r, dict) and key in r:
-                        new_results.append(r[key])
-                    else:
-                        # Key not found or r is not a dict, no results
-                        pass
-
-            elif op_type == "index":
-
-                for r in results:
-
-                    if isinstance(r, list):
-                        if value == "*":
-                            new_results.extend(r)
-
-                        else:
-                            try:
-                                # Numeric index
-                                idx = int(value)
-                                if 0 <= idx < len(r):
-                                    new_results.append(r[idx])
-                            except ValueError:
-                                # Invalid index
-                                pass
-
-                    elif isinstance(r, dict):
-                        pass
-
-            elif op_type == "filter":
-                # Filter the results; only objects that satisfy the condition remain
-                for r in results:
-                    if isinstance(r, dict) and evaluate_filter_condition(r, value):
-                        new_results.append(r)
-                    elif isinstance(r, list):
-                        # If it's a list, apply the filter to each element
-                        for item in r:
-                            if isinstance(item, dict) and evaluate_filter_condition(
-                                item, value
-                            ):
-                                new_results.append(item)
-
-            results = new_results
-
-            # If no results remain, break early
-            if not results:
-                break
-
-        # Recurse with the remaining path parts on the filtered results
-        final_results = []
-        for res in results:
-            final_results.extend(recursive_find(parts[1:], res))
-
-        return final_results
-
-    # Preprocessing the jpath: remove leading "$."
-    jpath = jpath.strip()
-    if jpath.startswith("$."):
-        jpath = jpath[2:]
-
-    # Split by '.' first
-    raw_segments = split_path(jpath)
-
-    # Parse each segment into structured operations
-    path_parts = [parse_path_segment(s) for s in raw_segments if s]
-
-    # Now recursively find
-    return recursive_find(path_parts, obj)
+    return compile_path(jpath).find_all(obj)
 
 
 def find_all_by_jsonpaths(jpaths: list, obj: dict) -> list:
@@ -211,27 +39,21 @@ def find_all_by_jsonpaths(jpaths: list, obj: dict) -> list:
 
 
 def find_all_with_field_value(jpath, field, value, obj):
-    # Construct the filter expression
-    filter_expr = f"@.{field} == '{value}'"
-    cleaned_path = re.sub(r"\[\*]$", "", jpath)
-    jsonpath_expr = parse(ensure_root(f"{cleaned_path}[?({filter_expr})]"))
-    return [m.value for m in jsonpath_expr.find(obj)]
+    return find_all_with_filters(jpath, {field: value}, obj)
 
 
 def find_all_with_filters(jpath, filters, obj):
-    # Construct the filter expression
-    filter_expr = " & ".join(
-        [f"@.{field} == '{value}'" for field, value in filters.items()]
-    )
+    # The filter applies to the elements of the collection, so drop a trailing wildcard
     cleaned_path = re.sub(r"\[\*]$", "", jpath)
-    jsonpath_expr = parse(ensure_root(f"{cleaned_path}[?({filter_expr})]"))
-    return [m.value for m in jsonpath_expr.find(obj)]
+    return compile_path(cleaned_path).find_all_where(filters, obj)
 
 
-def find_one(jpath, obj, default=None):
-    matches = find_all(jpath, obj)
+def iter_all(jpath, obj):
+    return compile_path(jpath).iter_all(obj)
+
 
-    return matches[0] if len(matches) > 0 else default
+def find_one(jpath, obj, default=None):
+    return compile_path(jpath).find_first(obj, default)
 
 
 def get_dict_of_zones_and_terminals_served_by_hvac_sys(
@@ -358,19 +180,13 @@ def load_json_file(file_path):
 
 
 def get_zones_from_json(json_data):
-    """Extracts zones from the given JSON data."""
+    """Extracts the zones of every building segment of every RMD from the given JSON data."""
     return find_all(
-        "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*]",
+        "$.ruleset_model_descriptions[*].buildings[*].building_segments[*].zones[*]",
         json_data,
     )
 
 
-def find_best_match(target, candidates, cutoff=0.4):
-    """Finds the best match for a target in a list of candidates."""
-    matches = get_close_matches(target, candidates, n=1, cutoff=cutoff)
-    return matches[0] if matches else None
-
-
 def compare_values(value, reference_value, absolute_tolerance=None, relative_tolerance=None):
     """Compares a generated value with a reference value based on the tolerance."""
     if isinstance(reference_value, str):
@@ -387,6 +203,60 @@ def compare_values(value, reference_value, absolute_tolerance=None, relative_tol
     return False
 
 
+def is_real_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def isclose_array(values, reference_values, relative_tolerance=1e-09, absolute_tolerance=0.0):
+    """Evaluates math.isclose() for each pair of numbers of two broadcastable arrays of floats."""
+    with np.errstate(invalid="ignore"):
+        difference = np.abs(values - reference_values)
+        magnitude = np.maximum(np.abs(values), np.abs(reference_values))
+        # Like math.isclose(), infinities are only close to themselves
+        within_tolerance = (
+            (difference <= np.maximum(relative_tolerance * magnitude, absolute_tolerance))
+            & np.isfinite(values)
+            & np.isfinite(reference_values)
+        )
+    return within_tolerance | (values == reference_values)
+
+
+def compare_values_batch(values, reference_values, absolute_tolerance=None):
+    """
+    Compares pairs of generated and reference values like compare_values(), evaluating the pairs of real numbers
+    together as arrays.
+
+    Returns
+    -------
+    list: the result of compare_values() for each pair of real numbers, and None for any other pair
+    """
+    numeric_positions = [
+        position
+        for position, (value, reference_value) in enumerate(zip(values, reference_values))
+        if is_real_number(value) and is_real_number(reference_value)
+    ]
+    results = [None] * len(values)
+    if not numeric_positions or (absolute_tolerance and not is_real_number(absolute_tolerance)):
+        return results
+
+    if absolute_tolerance:
+        if absolute_tolerance < 0:
+            # Left to compare_values(), which raises the same error as math.isclose()
+            return results
+        matched = isclose_array(
+            np.array([values[position] for position in numeric_positions], dtype=float),
+            np.array([reference_values[position] for position in numeric_positions], dtype=float),
+            absolute_tolerance=absolute_tolerance,
+        ).tolist()
+    else:
+        # Numbers are never a match without a tolerance
+        matched = [False] * len(numeric_positions)
+
+    for position, does_match in zip(numeric_positions, matched):
+        results[position] = does_match
+    return results
+
+
 def compare_azimuth(
     target,
     candidate,
@@ -1,5 +1,8 @@
+import argparse
+import shutil
 from pathlib import Path
 
+from rpd_tester.cache import CACHE_DIR_NAME
 from rpd_tester.perform_comparison import results_data, run_comparison_for_all_tests
 
 # ---------- SET THE VALUES FOR ALL CONFIGURATION VARIABLES ----------
@@ -13,7 +16,37 @@ RULESET_NAME = "ASHRAE Standard 90.1-2019, Performance Rating Method"
 RULESET_CHECKING_SPECIFICATION_NAME = "ASHRAE Standard 90.1-2019, Performance Rating Method"
 # --------------------------------------------------------------------
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare generated RPDs against the reference RPDs.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of test cases to run in parallel worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--mapping-jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes mapping the object families of each test case, when --jobs is 1 (default: 1)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Parse the reference RPDs and map the objects without reading or writing the {CACHE_DIR_NAME} directory",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help=f"Delete the {CACHE_DIR_NAME} directory before running",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
     config_vars = [
         GENERATION_SOFTWARE_NAME,
         GENERATION_SOFTWARE_VERSION,
@@ -36,5 +69,10 @@ if __name__ == "__main__":
         "ruleset_checking_specification_name": RULESET_CHECKING_SPECIFICATION_NAME,
     }
     test_directory = Path(__file__).resolve().parent / "bem_test_files"
+    cache_directory = Path(__file__).resolve().parent / CACHE_DIR_NAME
+    if args.clear_cache:
+        shutil.rmtree(cache_directory, ignore_errors=True)
     results_data.update(CONFIG_DATA)
-    run_comparison_for_all_tests(test_directory)
+    run_comparison_for_all_tests(
+        test_directory, args.jobs, args.mapping_jobs, None if args.no_cache else cache_directory
+    )
@@ -0,0 +1,96 @@
+import unittest
+from rpd_tester.assignment import *
+from rpd_tester.map_objects import match_by_attributes
+
+
+class TestAssignment(unittest.TestCase):
+    def test_score_matrix_matches_compare_attributes(self):
+        generated_values = [
+            {"id": "Wall 1", "area": 100.05, "azimuth": 90, "type": "A", "capacity": 1000, "layers": [1, 2]},
+            {"id": "Wall 2", "area": 50, "azimuth": 270, "adjacent_zone": "Zone 1", "type": None},
+            {"id": "Wall 3", "capacity": True, "type": "B"},
+        ]
+        reference_values = [
+            {"id": "Ref 1", "area": 100, "azimuth": 90, "type": "A", "capacity": 1005, "layers": [3, 4]},
+            {"id": "Ref 2", "area": 50.2, "azimuth": 90, "adjacent_zone": "Ref Zone 1", "capacity": 1.0},
+            {"id": "Ref 3", "area": 49.95, "azimuth": 270, "type": "B", "capacity": None},
+        ]
+        attrs = ["area", "azimuth", "type", "capacity", "layers"]
+
+        scores = build_score_matrix(generated_values, reference_values, attrs, "Zone 1", "Ref Zone 1")
+        for i, target in enumerate(generated_values):
+            for j, candidate in enumerate(reference_values):
+                self.assertEqual(
+                    sum(compare_attributes(target, candidate, attr, "Zone 1", "Ref Zone 1") for attr in attrs),
+                    scores[i, j],
+                )
+
+    def test_infinities_are_only_close_to_themselves(self):
+        targets = np.array([math.inf, 1.0])
+        candidates = np.array([math.inf, 1e300, 1.0])
+
+        np.testing.assert_array_equal(
+            [[True, False, False], [False, False, True]],
+            isclose_matrix(targets, candidates, relative_tolerance=NUMERIC_RELATIVE_TOLERANCE),
+        )
+
+    def test_row_reduction_keeps_the_assignment_optimal(self):
+        # Both rows are cheapest in column 0, so row 1 is only placed by an augmenting path
+        cost = np.array([[0.0, 5.0, 9.0], [0.0, 1.0, 9.0]])
+        self.assertEqual([0, 1], hungarian(cost).tolist())
+        self.assertEqual([1, 0], hungarian(np.array([[0.0, 1.0], [0.0, 5.0]])).tolist())
+
+    def test_optimal_assignment_beats_greedy(self):
+        scores = np.array([[2, 2], [2, 0]])
+        self.assertEqual({0: 0, 1: 1}, greedy_assignment(scores))
+        self.assertEqual({0: 1, 1: 0}, solve_assignment(scores))
+
+    def test_preferred_pairs_break_ties(self):
+        scores = np.array([[1, 1, 0], [1, 1, 0]])
+        self.assertEqual({0: 1, 1: 0}, solve_assignment(scores, [(0, 1), (1, 0)]))
+
+    def test_more_rows_than_columns(self):
+        scores = np.array([[1], [3], [2]])
+        self.assertEqual({1: 0}, solve_assignment(scores))
+
+    def test_bucketed_surface_matching_matches_score_matrix(self):
+        generated_values = [
+            {"id": "Wall 1", "area": 100, "azimuth": 90},
+            {"id": "Wall 2", "area": 100.05, "azimuth": 270, "adjacent_zone": "Zone 1"},
+            {"id": "Wall 3", "area": 20, "azimuth": 0},
+            {"id": "Wall 4", "area": 55, "azimuth": 180},
+        ]
+        reference_values = [
+            {"id": "Ref 1", "area": 20, "azimuth": 0},
+            {"id": "Ref 2", "area": 100, "azimuth": 90, "adjacent_zone": "Other Zone"},
+            {"id": "Ref 3", "area": 99.95, "azimuth": 90},
+            {"id": "Ref 4", "area": 30, "azimuth": 45},
+        ]
+        self.assertTrue(can_bucket_surfaces(generated_values, reference_values))
+
+        scores = build_score_matrix(generated_values, reference_values, ["area", "azimuth"], "Zone 1", "Ref Zone 1")
+        best_positions, assignment = match_surfaces_by_buckets(
+            generated_values, reference_values, "Zone 1", "Ref Zone 1"
+        )
+        self.assertEqual(
+            get_best_match_positions(scores, [surface["id"] for surface in reference_values]), best_positions
+        )
+        self.assertEqual(greedy_assignment(scores), assignment)
+
+    def test_zones_with_hundreds_of_surfaces_are_bucketed(self):
+        surface_count = 3 * HUNGARIAN_MAX_SIZE
+        generated_values = [
+            {"id": f"Wall {i}", "area": float(i % 7 + 1), "azimuth": float(i % 4 * 90)} for i in range(surface_count)
+        ]
+        reference_values = [
+            {"id": f"Ref {i}", "area": float(i % 5 + 1), "azimuth": float(i % 4 * 90)} for i in range(surface_count)
+        ]
+
+        scores = build_score_matrix(generated_values, reference_values, ["area", "azimuth"], "Zone 1", "Ref Zone 1")
+        expected = {
+            generated_values[i]["id"]: reference_values[j]["id"] for i, j in greedy_assignment(scores).items()
+        }
+        self.assertEqual(
+            expected,
+            match_by_attributes(generated_values, reference_values, "Zone 1", "Ref Zone 1", ["area", "azimuth"]),
+        )
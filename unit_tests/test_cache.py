@@ -0,0 +1,98 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from rpd_tester.cache import *
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temp_dir.name) / CACHE_DIR_NAME
+        self.rpd_file = Path(self.temp_dir.name) / "E-1.rpd"
+        self.write_rpd(1000)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_rpd(self, volume):
+        rpd = {"id": "Test RPD", "zones": [{"id": "Zone 1", "volume": volume}]}
+        self.rpd_file.write_text(json.dumps(rpd))
+
+    def load_and_save(self):
+        rpd, rpd_index = load_cached_rpd(self.rpd_file, {"id"}, self.cache_dir)
+        save_cached_rpd(rpd_index, self.rpd_file, {"id"}, self.cache_dir)
+        return rpd, rpd_index
+
+    def test_warm_load_uses_cache(self):
+        rpd, rpd_index = self.load_and_save()
+        cached_rpd, cached_index = load_cached_rpd(self.rpd_file, {"id"}, self.cache_dir)
+
+        self.assertEqual(1, len(list(self.cache_dir.glob("E-1.*.pickle"))))
+        self.assertEqual(rpd, cached_rpd)
+        self.assertIs(cached_rpd, cached_index.rpd)
+        self.assertIs(cached_rpd["zones"][0], cached_index.get("Zone 1", "zones"))
+        self.assertEqual(
+            [cached_rpd["zones"][0]],
+            cached_index.find_all('$.zones[?(@.id == "Zone 1")]'),
+        )
+
+    def test_changed_file_invalidates_cache(self):
+        self.load_and_save()
+        self.write_rpd(2000)
+        rpd, _ = self.load_and_save()
+
+        self.assertEqual(2000, rpd["zones"][0]["volume"])
+        self.assertEqual(1, len(list(self.cache_dir.glob("E-1.*.pickle"))))
+
+    def test_fingerprints_computed_after_loading_are_saved(self):
+        self.rpd_file.write_text(json.dumps({"id": "Test RPD", "schedules": [{"id": "Schedule 1", "hourly_values": [1.0] * 24}]}))
+        _, rpd_index = self.load_and_save()
+        _, rpd_index = load_cached_rpd(self.rpd_file, {"id"}, self.cache_dir)
+        self.assertFalse(rpd_index.changed)
+
+        fingerprint = rpd_index.get_schedule_fingerprint("Schedule 1")
+        save_cached_rpd(rpd_index, self.rpd_file, {"id"}, self.cache_dir)
+        _, cached_index = load_cached_rpd(self.rpd_file, {"id"}, self.cache_dir)
+
+        self.assertEqual({"Schedule 1": fingerprint}, cached_index.schedule_fingerprints)
+        self.assertEqual({}, cached_index.schedule_hourly_values)
+
+    def test_object_map_cache_key_ignores_hourly_values(self):
+        rpd = {"id": "Test RPD", "schedules": [{"id": "Schedule 1", "hourly_values": [0.5] * 8760}]}
+        cache_key = get_object_map_cache_key(rpd, b"reference")
+
+        rpd["schedules"][0]["hourly_values"] = [1.0] * 8760
+        self.assertEqual(cache_key, get_object_map_cache_key(rpd, b"reference"))
+
+        rpd["schedules"][0]["id"] = "Schedule 2"
+        self.assertNotEqual(cache_key, get_object_map_cache_key(rpd, b"reference"))
+        self.assertNotEqual(cache_key, get_object_map_cache_key(rpd, b"changed reference"))
+
+    def test_object_map_cache_is_saved_and_reloaded(self):
+        cache_file = self.cache_dir / OBJECT_MAP_CACHE_DIR_NAME / "E-1.key.pickle"
+        map_cache = ObjectMapCache(cache_file, "E-1")
+        map_cache.put("zones", ({"Zone 1 gen": "Zone 1"}, [], ""))
+        map_cache.save()
+
+        self.assertEqual(({"Zone 1 gen": "Zone 1"}, [], ""), ObjectMapCache(cache_file, "E-1").get("zones"))
+        self.assertIsNone(ObjectMapCache(cache_file, "E-1").get("hvac"))
+
+    def test_unused_units_are_dropped_with_superseded_cache_files(self):
+        object_map_dir = self.cache_dir / OBJECT_MAP_CACHE_DIR_NAME
+        zone_1_key = ("surfaces", "Test RMD", "Test RMD", "Zone 1 gen", "Zone 1")
+        zone_2_key = ("surfaces", "Test RMD", "Test RMD", "Zone 2 gen", "Zone 2")
+        map_cache = ObjectMapCache(object_map_dir / "E-1.first.pickle", "E-1")
+        map_cache.put_unit(zone_1_key, "zone 1", ({}, [], ""))
+        map_cache.put_unit(zone_2_key, "zone 2", ({}, [], ""))
+        map_cache.put("surfaces", ([{}], [], ""))
+        map_cache.save()
+
+        # The next version of the model no longer has Zone 2 gen
+        map_cache = ObjectMapCache(object_map_dir / "E-1.second.pickle", "E-1")
+        self.assertEqual(({}, [], ""), map_cache.get_unit(zone_1_key, "zone 1"))
+        map_cache.put("surfaces", ([{}], [], ""))
+        map_cache.save()
+
+        self.assertEqual(["E-1.second.pickle"], [file.name for file in object_map_dir.iterdir()])
+        self.assertEqual([zone_1_key], list(ObjectMapCache(object_map_dir / "E-1.third.pickle", "E-1").units))
@@ -0,0 +1,29 @@
+import unittest
+from difflib import get_close_matches
+from rpd_tester.name_matcher import *
+
+
+class TestNameMatcher(unittest.TestCase):
+    def setUp(self):
+        self.names = [
+            "Office North Perimeter",
+            "Office South Perimeter",
+            "Office Core",
+            "Corridor",
+            "Mech Room",
+            "ab",
+            "ba",
+        ]
+        self.name_matcher = NameMatcher(self.names)
+
+    def test_matches_get_close_matches(self):
+        for target in ["Office North Perimeter gen", "office core", "Corridor 2", "Mechanical", "ab", "xyz", ""]:
+            expected = get_close_matches(target, self.names, n=1, cutoff=0.4)
+            self.assertEqual(expected[0] if expected else None, self.name_matcher.best_match(target))
+
+    def test_tie_goes_to_greater_name(self):
+        # "ab" and "ba" both have a ratio of 0.5 with "a"
+        self.assertEqual("ba", NameMatcher(["ab", "ba"]).best_match("a"))
+
+    def test_no_match_below_cutoff(self):
+        self.assertIsNone(self.name_matcher.best_match("Zzzzzzzzzz"))
@@ -0,0 +1,211 @@
+import copy
+import pickle
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from rpd_tester.cache import ObjectMapCache
+from rpd_tester.map_objects import *
+
+
+def make_rpd(suffix=""):
+    return {
+        "id": "Test RPD",
+        "ruleset_model_descriptions": [
+            {
+                "id": "Test RMD",
+                "buildings": [
+                    {
+                        "id": "Default Building",
+                        "building_segments": [
+                            {
+                                "id": "Default Building Segment",
+                                "zones": [
+                                    {"id": f"Zone 1{suffix}", "surfaces": [], "terminals": []},
+                                    {"id": f"Zone 2{suffix}", "surfaces": [], "terminals": []},
+                                ],
+                            }
+                        ],
+                    }
+                ],
+                "boilers": [{"id": f"Boiler 1{suffix}", "draft_type": "NATURAL"}],
+                "fluid_loops": [{"id": f"HHW Loop{suffix}", "type": "HEATING"}],
+                "pumps": [{"id": f"HHW Pump{suffix}", "loop_or_piping": f"HHW Loop{suffix}"}],
+            }
+        ],
+    }
+
+
+class TestObjectMap(unittest.TestCase):
+    def setUp(self):
+        self.object_id_map, _, self.map_errors = map_objects(make_rpd(" gen"), make_rpd())
+
+    def test_only_zones_are_mapped_up_front(self):
+        self.assertEqual([], self.map_errors)
+        self.assertEqual({"zones"}, self.object_id_map.mapped_families)
+        self.assertEqual({"Zone 1 gen": "Zone 1", "Zone 2 gen": "Zone 2"}, dict(self.object_id_map))
+
+    def test_family_is_mapped_on_lookup(self):
+        self.assertEqual("Boiler 1", self.object_id_map.get("Boiler 1 gen"))
+        self.assertEqual({"zones", "boilers"}, self.object_id_map.mapped_families)
+
+    def test_dependencies_are_mapped_first(self):
+        self.assertIn("HHW Pump gen", self.object_id_map)
+        self.assertEqual({"zones", "loops", "pumps"}, self.object_id_map.mapped_families)
+        self.assertEqual("HHW Loop", self.object_id_map["HHW Loop gen"])
+
+    def test_families_mapped_by_executor_match_serial_mapping(self):
+        self.object_id_map.map_all()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            parallel_map, _, _ = map_objects(make_rpd(" gen"), make_rpd(), executor=executor)
+            parallel_map.map_all()
+
+        self.assertEqual(set(MAPPING_FAMILIES), parallel_map.mapped_families)
+        self.assertEqual(dict(self.object_id_map), dict(parallel_map))
+        self.assertEqual(self.object_id_map.errors, parallel_map.errors)
+
+    def test_units_mapped_by_executor_are_added_to_the_map_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir, ProcessPoolExecutor(max_workers=2) as executor:
+            map_cache = ObjectMapCache(Path(temp_dir) / "E-1.key.pickle", "E-1")
+            parallel_map, _, _ = map_objects(make_rpd(" gen"), make_rpd(), executor=executor, map_cache=map_cache)
+            parallel_map.require(["boilers", "pumps"])
+            # Workers are sent only the keys of the RMDs, the maps and the units of the family they map
+            worker_mapper = pickle.loads(pickle.dumps(parallel_map.get_worker_mapper("pumps", 0)))
+
+        self.assertIn(("boilers", "Test RMD", "Test RMD"), map_cache.new_units)
+        self.assertIn(("boilers", "Test RMD", "Test RMD"), map_cache.used_unit_keys)
+        self.assertEqual({"id", "pumps"}, set(worker_mapper.generated_view["ruleset_model_descriptions"][0]))
+        self.assertEqual({"HHW Loop gen": "HHW Loop"}, dict(worker_mapper.rmd_map))
+        self.assertNotIsInstance(worker_mapper.map_cache, ObjectMapCache)
+
+    def test_only_changed_units_are_mapped_again(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_dir = Path(temp_dir)
+            generated_rpd = make_rpd(" gen")
+            map_cache = ObjectMapCache(cache_dir / "E-1.first.pickle", "E-1")
+            map_objects(generated_rpd, make_rpd(), map_cache=map_cache)[0].map_all()
+            map_cache.save()
+
+            generated_rpd["ruleset_model_descriptions"][0]["boilers"][0]["draft_type"] = "FORCED"
+            map_cache = ObjectMapCache(cache_dir / "E-1.second.pickle", "E-1")
+            object_id_map = map_objects(generated_rpd, make_rpd(), map_cache=map_cache)[0]
+            object_id_map.map_all()
+
+        self.object_id_map.map_all()
+        self.assertEqual({("boilers", "Test RMD", "Test RMD")}, set(map_cache.new_units))
+        self.assertEqual(dict(self.object_id_map), dict(object_id_map))
+
+
+class TestReferenceMatchers(unittest.TestCase):
+    def test_pumps_are_matched_by_loop_without_changing_the_reference_list(self):
+        generated_pumps = [
+            {"id": "Pump A", "loop_or_piping": "Loop 1 gen"},
+            {"id": "Pump B", "loop_or_piping": "Loop 1 gen"},
+            {"id": "Pump C", "loop_or_piping": "Loop 1 gen"},
+        ]
+        reference_pumps = [
+            {"id": "Pump 1", "loop_or_piping": "Loop 1"},
+            {"id": "Pump 2", "loop_or_piping": "Loop 2"},
+            {"id": "Pump 3", "loop_or_piping": "Loop 1"},
+        ]
+        reference_pumps_before = list(reference_pumps)
+
+        mapping = match_pumps_by_references(generated_pumps, reference_pumps, {"Loop 1 gen": "Loop 1"})
+
+        self.assertEqual({"Pump A": "Pump 1", "Pump B": "Pump 3"}, mapping)
+        self.assertEqual(reference_pumps_before, reference_pumps)
+
+    def test_terminals_skip_references_already_used(self):
+        hvac_key = "served_by_heating_ventilating_air_conditioning_system"
+        generated_terminals = [
+            {"id": "Terminal A", hvac_key: "HVAC gen", "type": "VAV"},
+            {"id": "Terminal B", hvac_key: "HVAC gen", "type": "VAV"},
+        ]
+        reference_terminals = [
+            {"id": "Terminal 1", hvac_key: "HVAC", "type": "VAV"},
+            {"id": "Terminal 2", hvac_key: "HVAC", "type": "VAV"},
+        ]
+
+        mapping = match_terminals_by_references(generated_terminals, reference_terminals, {"HVAC gen": "HVAC"})
+
+        self.assertEqual({"Terminal A": "Terminal 1", "Terminal B": "Terminal 2"}, mapping)
+
+
+def make_multi_rmd_rpd(zone_ids, suffix=""):
+    return {
+        "id": "Test RPD",
+        "ruleset_model_descriptions": [
+            {
+                "id": rmd_id,
+                "buildings": [
+                    {
+                        "id": "Default Building",
+                        "building_segments": [
+                            {"id": segment_id, "zones": [{"id": f"{rmd_id} {zone_id}{suffix}"}]}
+                            for segment_id, zone_id in zip(["North", "South"], zone_ids)
+                        ],
+                    }
+                ],
+                "boilers": [{"id": f"{rmd_id} Boiler{suffix}", "draft_type": "NATURAL"}],
+            }
+            for rmd_id in ["Proposed", "Baseline"]
+        ],
+    }
+
+
+class TestHierarchicalMapping(unittest.TestCase):
+    def setUp(self):
+        self.generated_rpd = make_multi_rmd_rpd(["Office", "Office 2"], " gen")
+        self.reference_rpd = make_multi_rmd_rpd(["Office 2", "Office"])
+        self.expected_map = {
+            "Proposed Office gen": "Proposed Office 2",
+            "Proposed Office 2 gen": "Proposed Office",
+            "Baseline Office gen": "Baseline Office 2",
+            "Baseline Office 2 gen": "Baseline Office",
+            "Proposed Boiler gen": "Proposed Boiler",
+            "Baseline Boiler gen": "Baseline Boiler",
+        }
+
+    def test_zones_are_matched_within_their_mapped_segment(self):
+        object_id_map, _, map_errors = map_objects(self.generated_rpd, self.reference_rpd)
+        object_id_map.map_all()
+
+        self.assertEqual([], map_errors)
+        self.assertEqual(self.expected_map, dict(object_id_map))
+
+    def test_rmds_mapped_by_executor_match_serial_mapping(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            object_id_map, _, _ = map_objects(self.generated_rpd, self.reference_rpd, executor=executor)
+            object_id_map.require(["boilers", "loops"])
+
+        self.assertEqual(self.expected_map, dict(object_id_map))
+
+    def test_zones_of_unpaired_segments_are_matched_within_their_building(self):
+        for rmd in self.generated_rpd["ruleset_model_descriptions"]:
+            rmd["buildings"][0]["building_segments"][1]["id"] = "Xyz"
+        object_id_map, _, map_errors = map_objects(self.generated_rpd, self.reference_rpd)
+        object_id_map.map_all()
+
+        self.assertEqual([], map_errors)
+        self.assertEqual(self.expected_map, dict(object_id_map))
+
+    def test_rmds_sharing_ids_are_mapped_separately(self):
+        generated_rpd, reference_rpd = make_rpd(" gen"), make_rpd()
+        for rpd in (generated_rpd, reference_rpd):
+            rmd = rpd["ruleset_model_descriptions"][0]
+            rpd["ruleset_model_descriptions"] = [dict(copy.deepcopy(rmd), id=rmd_id) for rmd_id in ["Proposed", "Baseline"]]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            map_cache = ObjectMapCache(Path(temp_dir) / "E-1.key.pickle", "E-1")
+            object_id_map, _, map_errors = map_objects(generated_rpd, reference_rpd, map_cache=map_cache)
+            object_id_map.require(["pumps"])
+
+        expected_rmd_map = {
+            "Zone 1 gen": "Zone 1", "Zone 2 gen": "Zone 2", "HHW Loop gen": "HHW Loop", "HHW Pump gen": "HHW Pump"
+        }
+        self.assertEqual([], map_errors)
+        self.assertEqual([expected_rmd_map, expected_rmd_map], [dict(rmd_map) for rmd_map in object_id_map.rmd_maps])
+        self.assertEqual(
+            {("pumps", "Proposed", "Proposed"), ("pumps", "Baseline", "Baseline")},
+            {unit_key for unit_key in map_cache.new_units if unit_key[0] == "pumps"},
+        )
@@ -0,0 +1,144 @@
+import unittest
+from rpd_tester.path_engine import *
+
+
+class TestPathEngine(unittest.TestCase):
+    def setUp(self):
+        self.rpd = {
+            "id": "Test RPD",
+            "ruleset_model_descriptions": [
+                {
+                    "id": "Test RMD",
+                    "buildings": [
+                        {
+                            "id": "Default Building",
+                            "building_segments": [
+                                {
+                                    "id": "Default Building Segment",
+                                    "zones": [
+                                        {
+                                            "id": "Zone 1",
+                                            "surfaces": [
+                                                {
+                                                    "id": "Zone 1 Exterior Wall",
+                                                    "classification": "WALL",
+                                                    "adjacent_to": "EXTERIOR",
+                                                    "area": 50,
+                                                },
+                                                {
+                                                    "id": "Zone 1 Interior Wall",
+                                                    "classification": "WALL",
+                                                    "adjacent_to": "INTERIOR",
+                                                    "adjacent_zone": "Zone 2",
+                                                    "area": 25,
+                                                },
+                                            ],
+                                        },
+                                        {
+                                            "id": "Zone 2",
+                                            "surfaces": [
+                                                {
+                                                    "id": "Zone 2 Roof",
+                                                    "classification": "CEILING",
+                                                    "adjacent_to": "EXTERIOR",
+                                                    "area": 100,
+                                                },
+                                            ],
+                                        },
+                                    ],
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ],
+        }
+
+    def test_compile_path_is_cached(self):
+        json_path = "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*]"
+        self.assertIs(compile_path(json_path), compile_path(json_path))
+
+    def test_wildcard_and_index(self):
+        result = compile_path(
+            "$.ruleset_model_descriptions[*].buildings[0].building_segments[0].zones[*].surfaces[*].area"
+        ).find_all(self.rpd)
+        self.assertEqual([50, 25, 100], result)
+
+    def test_out_of_range_index(self):
+        result = compile_path(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[5]"
+        ).find_all(self.rpd)
+        self.assertEqual([], result)
+
+    def test_filter_on_list(self):
+        result = compile_path(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.adjacent_to == 'EXTERIOR')].id"
+        ).find_all(self.rpd)
+        self.assertEqual(["Zone 1 Exterior Wall", "Zone 2 Roof"], result)
+
+    def test_combined_filter(self):
+        result = compile_path(
+            '$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[*][?(@.adjacent_to = "EXTERIOR" and @.classification = "WALL")].id'
+        ).find_all(self.rpd)
+        self.assertEqual(["Zone 1 Exterior Wall"], result)
+
+    def test_unparsable_filter_matches_nothing(self):
+        result = compile_path(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.area > 10)]"
+        ).find_all(self.rpd)
+        self.assertEqual([], result)
+
+    def test_ampersand_conjunction(self):
+        result = compile_path(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.id == 'Zone 2 Roof' & @.adjacent_to == \"INTERIOR\")]"
+        ).find_all(self.rpd)
+        self.assertEqual([], result)
+
+    def test_quoted_value_containing_conjunction(self):
+        self.assertEqual(
+            [("id", "Storage & Mech's Room"), ("adjacent_to", "EXTERIOR")],
+            parse_filter_condition(
+                "@.id == \"Storage & Mech's Room\" and @.adjacent_to == 'EXTERIOR'"
+            ),
+        )
+
+    def test_find_all_where(self):
+        result = compile_path(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces"
+        ).find_all_where({"classification": "WALL", "adjacent_zone": "Zone 2"}, self.rpd)
+        self.assertEqual(["Zone 1 Interior Wall"], [surface["id"] for surface in result])
+
+    def test_find_all_paths_matches_find_all(self):
+        json_paths = [
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].id",
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[*].area",
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.adjacent_to == 'INTERIOR')].id",
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].volume",
+        ]
+        result = find_all_paths(json_paths, self.rpd)
+        for json_path in json_paths:
+            self.assertEqual(compile_path(json_path).find_all(self.rpd), result[json_path])
+        self.assertEqual([], result[json_paths[-1]])
+
+    def test_iter_all_matches_find_all(self):
+        json_path = "$.ruleset_model_descriptions[*].buildings[*].building_segments[*].zones[*].surfaces[*].id"
+        compiled = compile_path(json_path)
+        self.assertEqual(compiled.find_all(self.rpd), list(compiled.iter_all(self.rpd)))
+
+    def test_find_first(self):
+        compiled = compile_path(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.adjacent_to == 'EXTERIOR')].area"
+        )
+        self.assertEqual(50, compiled.find_first(self.rpd))
+        self.assertEqual("missing", compile_path("$.weather").find_first(self.rpd, "missing"))
+
+    def test_find_all_with_context(self):
+        result = compile_path(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.adjacent_to == 'EXTERIOR')].area"
+        ).find_all_with_context(self.rpd)
+        self.assertEqual([50, 100], [match.value for match in result])
+        self.assertEqual(["Zone 1 Exterior Wall", "Zone 2 Roof"], [match.parent_id for match in result])
+        self.assertEqual(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[1].surfaces[0].area",
+            result[1].path,
+        )
@@ -0,0 +1,147 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from rpd_tester.map_objects import COLLECTION_FAMILIES
+from rpd_tester.perform_comparison import (
+    ALIGNED_FAMILIES,
+    add_specification_test,
+    get_aligned_collection,
+    handle_ordered_comparisons,
+    results_data,
+    run_comparison_for_all_tests,
+)
+from run import parse_args
+
+
+def make_rpd(boilers):
+    return {"id": "Test RPD", "ruleset_model_descriptions": [{"id": "Test RMD", "boilers": boilers}]}
+
+
+class TestOrderedComparisons(unittest.TestCase):
+    def setUp(self):
+        self.json_key_path = "$.ruleset_model_descriptions[0].boilers[*].efficiency"
+        self.path_spec = {"json-key-path": self.json_key_path, "tolerance": 0.01}
+        self.specification_test = add_specification_test({"specification_tests": []}, self.json_key_path)
+        self.generated_rpd = make_rpd([
+            {"id": "Boiler 2 gen", "efficiency": 0.9},
+            {"id": "Boiler 1 gen", "efficiency": 0.8},
+            {"id": "Boiler 3 gen", "efficiency": 0.7},
+        ])
+        self.reference_rpd = make_rpd([
+            {"id": "Boiler 1", "efficiency": 0.8},
+            {"id": "Boiler 2", "efficiency": 0.85},
+        ])
+        self.object_id_map = {"Boiler 1 gen": "Boiler 1", "Boiler 2 gen": "Boiler 2"}
+
+    def test_values_are_aligned_through_the_object_map(self):
+        warnings, errors = handle_ordered_comparisons(
+            self.path_spec, self.object_id_map, self.reference_rpd, self.generated_rpd, self.specification_test
+        )
+
+        self.assertEqual([], warnings)
+        self.assertEqual(
+            ["Value mismatch at 'Boiler 2 gen' for key 'efficiency'. Expected: '0.85'; got: '0.9'"], errors
+        )
+        # Boiler 3 gen is not mapped, so it is left out of the comparison
+        self.assertEqual(
+            [("Boiler 2 gen", "Boiler 2", "DIFFER"), ("Boiler 1 gen", "Boiler 1", "MATCH")],
+            [
+                (result["generated_instance_id"], result["reference_instance_id"], result["test_outcome"])
+                for result in self.specification_test["test_results"]
+            ],
+        )
+
+    def test_aligned_collections_are_registered(self):
+        self.assertEqual("boilers", get_aligned_collection(self.json_key_path))
+        self.assertEqual(
+            "zones",
+            get_aligned_collection("$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].terminals"),
+        )
+        self.assertIsNone(get_aligned_collection("$.ruleset_model_descriptions[0].schedules[*].hourly_values"))
+        self.assertEqual(
+            "surfaces",
+            get_aligned_collection("$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[*].area"),
+        )
+        self.assertTrue(set(ALIGNED_FAMILIES) <= set(COLLECTION_FAMILIES))
+
+
+def make_zone_rpd(volume):
+    return {
+        "id": "Test RPD",
+        "ruleset_model_descriptions": [
+            {
+                "id": "Test RMD",
+                "buildings": [
+                    {
+                        "id": "Building 1",
+                        "building_segments": [
+                            {"id": "Segment 1", "zones": [{"id": "Zone 1", "volume": volume}]}
+                        ],
+                    }
+                ],
+            }
+        ],
+    }
+
+
+class TestParallelRuns(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.test_dir = self.root / "bem_test_files"
+        for name in ("comparison_specs", "reference_rpds"):
+            (self.root / name).mkdir()
+
+        zone_path = "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].volume"
+        for test, volume in (("E-1", 100), ("E-2", 120), ("E-3", 100)):
+            (self.test_dir / test).mkdir(parents=True)
+            (self.test_dir / test / f"{test}_gen.rpd").write_text(json.dumps(make_zone_rpd(volume)))
+            (self.root / "reference_rpds" / f"{test}.rpd").write_text(json.dumps(make_zone_rpd(100)))
+            spec = {"json-test-key-paths": [{"json-key-path": zone_path, "tolerance": 1}]}
+            (self.root / "comparison_specs" / f"{test} spec.json").write_text(json.dumps(spec))
+
+        self.cwd = os.getcwd()
+        os.chdir(self.root)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        results_data["test_case_reports"] = []
+        self.temp_dir.cleanup()
+
+    def run_all(self, jobs):
+        results_data["test_case_reports"] = []
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), self.assertRaises(SystemExit):
+            run_comparison_for_all_tests(self.test_dir, jobs)
+        return output.getvalue(), (self.root / "rpd_test_results.json").read_text()
+
+    def test_parallel_run_matches_serial_run(self):
+        serial_output, serial_results = self.run_all(1)
+        parallel_output, parallel_results = self.run_all(2)
+
+        self.assertEqual(serial_output, parallel_output)
+        self.assertEqual(serial_results, parallel_results)
+        self.assertIn("Value mismatch at 'Zone 1' for key 'volume'", parallel_output)
+
+    def test_failing_test_case_is_reported_by_parallel_run(self):
+        # A malformed spec makes E-3 raise
+        (self.root / "comparison_specs" / "E-3 spec.json").write_text("{")
+        parallel_output, parallel_results = self.run_all(2)
+
+        # The test case that raised is reported with its traceback, and does not stop the others
+        self.assertIn("Comparison for E-3 failed:", parallel_output)
+        self.assertIn("JSONDecodeError", parallel_output)
+        self.assertEqual(2, len(json.loads(parallel_results)["test_case_reports"]))
+        # A serial run stops at the exception
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(json.JSONDecodeError):
+            run_comparison_for_all_tests(self.test_dir, 1)
+
+    def test_jobs_option(self):
+        self.assertEqual((1, 1), (parse_args([]).jobs, parse_args([]).mapping_jobs))
+        self.assertEqual(4, parse_args(["--jobs", "4"]).jobs)
+        self.assertEqual((False, False), (parse_args([]).no_cache, parse_args([]).clear_cache))
+        self.assertTrue(parse_args(["--no-cache"]).no_cache)
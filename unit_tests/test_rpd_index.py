@@ -0,0 +1,101 @@
+import unittest
+from rpd_tester.rpd_index import *
+
+
+class TestRPDIndex(unittest.TestCase):
+    def setUp(self):
+        self.rpd = {
+            "id": "Test RPD",
+            "ruleset_model_descriptions": [
+                {
+                    "id": "Test RMD",
+                    "buildings": [
+                        {
+                            "id": "Default Building",
+                            "building_segments": [
+                                {
+                                    "id": "Default Building Segment",
+                                    "zones": [
+                                        {
+                                            "id": "Zone 1",
+                                            "volume": 1000,
+                                            "surfaces": [
+                                                {
+                                                    "id": "Zone 1 Exterior Wall",
+                                                    "adjacent_to": "EXTERIOR",
+                                                    "area": 50,
+                                                },
+                                                {
+                                                    "id": "Zone 1 Interior Wall",
+                                                    "adjacent_to": "INTERIOR",
+                                                    "area": 25,
+                                                },
+                                            ],
+                                        },
+                                        {
+                                            "id": "Zone 2",
+                                            "volume": 2000,
+                                            "surfaces": [],
+                                        },
+                                    ],
+                                }
+                            ],
+                        }
+                    ],
+                    "boilers": [{"id": "Boiler 1", "rated_capacity": 100}],
+                }
+            ],
+        }
+        self.rpd_index = RPDIndex(self.rpd)
+
+    def test_entry_parent_and_path(self):
+        entry = self.rpd_index.get_entry("Zone 1 Interior Wall")
+        self.assertEqual("surfaces", entry.collection)
+        self.assertEqual("Zone 1", entry.parent["id"])
+        self.assertEqual(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[0].surfaces[1]",
+            entry.path,
+        )
+
+    def test_get_restricted_to_collection(self):
+        self.assertEqual(100, self.rpd_index.get("Boiler 1", "boilers")["rated_capacity"])
+        self.assertIsNone(self.rpd_index.get("Boiler 1", "chillers"))
+
+    def test_aligned_lookup(self):
+        lookup = self.rpd_index.compile_aligned_lookup(
+            "$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].volume",
+            "zones",
+        )
+        self.assertEqual(2000, lookup("Zone 2"))
+        self.assertIsNone(lookup("Boiler 1"))
+
+    def test_aligned_lookup_with_filter(self):
+        lookup = self.rpd_index.compile_aligned_lookup(
+            '$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.adjacent_to == "EXTERIOR")].area',
+            "surfaces",
+        )
+        self.assertEqual(50, lookup("Zone 1 Exterior Wall"))
+        self.assertIsNone(lookup("Zone 1 Interior Wall"))
+
+    def test_indexed_filter_matches_find_all(self):
+        json_path = '$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*].surfaces[?(@.adjacent_to == "INTERIOR")].area'
+        self.assertEqual([25], self.rpd_index.find_all(json_path))
+        self.assertIsNotNone(self.rpd_index.plan_query(json_path))
+
+    def test_indexed_filters_within_zone(self):
+        zone = self.rpd_index.get("Zone 1", "zones")
+        result = self.rpd_index.find_all('$.surfaces[?(@.adjacent_to == "EXTERIOR")]', zone)
+        self.assertEqual(["Zone 1 Exterior Wall"], [surface["id"] for surface in result])
+
+    def test_surface_graph(self):
+        zones = self.rpd["ruleset_model_descriptions"][0]["buildings"][0]["building_segments"][0]["zones"]
+        zones[0]["surfaces"][1]["adjacent_zone"] = "Zone 2"
+        surface_graph = RPDIndex(self.rpd).surface_graph
+
+        self.assertEqual(
+            ["Zone 1 Exterior Wall", "Zone 1 Interior Wall"],
+            [surface["id"] for surface in surface_graph.owned_surfaces["Zone 1"]],
+        )
+        self.assertEqual(["Zone 1 Interior Wall"], [surface["id"] for surface in surface_graph.adjacent_surfaces["Zone 2"]])
+        self.assertIs(zones[0], surface_graph.surface_zones["Zone 1 Interior Wall"])
+        self.assertEqual([], surface_graph.owned_surfaces["Zone 2"])
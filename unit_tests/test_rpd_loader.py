@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+from rpd_tester.rpd_loader import *
+
+REFERENCE_RPD_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reference_rpds", "E-1.rpd"
+)
+
+
+class TestRPDLoader(unittest.TestCase):
+    def setUp(self):
+        with open(REFERENCE_RPD_FILE, "r") as file:
+            self.full_rpd = json.load(file)
+
+    def test_required_keys(self):
+        self.assertEqual(
+            {"ruleset_model_descriptions", "schedules", "hourly_values", "id"},
+            get_required_keys(
+                ["$.ruleset_model_descriptions[0].schedules[?(@.id == 'Schedule 1')].hourly_values"]
+            ),
+        )
+
+    def test_unrequired_arrays_are_skipped(self):
+        rpd = load_rpd(REFERENCE_RPD_FILE, {"id"})
+        full_schedule = self.full_rpd["ruleset_model_descriptions"][0]["schedules"][0]
+        schedule = rpd["ruleset_model_descriptions"][0]["schedules"][0]
+
+        self.assertIsInstance(schedule["hourly_values"], SkippedArray)
+        self.assertEqual(full_schedule["hourly_values"], schedule["hourly_values"])
+        self.assertEqual(full_schedule["id"], schedule["id"])
+
+    def test_required_arrays_are_parsed(self):
+        rpd = load_rpd(REFERENCE_RPD_FILE, {"id", "hourly_values"})
+        self.assertEqual(self.full_rpd, rpd)
+
+    def test_brackets_within_strings_are_not_arrays(self):
+        values = list(range(SKIP_ARRAY_MIN_LENGTH))
+        rpd = {
+            "id": 'Notes [ "hourly_values": [',
+            "schedules": [
+                {"id": "Schedule ]", 'Copy of "hourly_values': values, "hourly_values": values},
+            ],
+        }
+        with tempfile.TemporaryDirectory() as temp_dir:
+            rpd_file = os.path.join(temp_dir, "E-1.rpd")
+            with open(rpd_file, "w") as file:
+                json.dump(rpd, file, indent=2)
+            loaded_rpd = load_rpd(rpd_file, {"id"})
+
+        schedule = loaded_rpd["schedules"][0]
+        self.assertIsInstance(schedule['Copy of "hourly_values'], SkippedArray)
+        self.assertIsInstance(schedule["hourly_values"], SkippedArray)
+        self.assertEqual(rpd, loaded_rpd)
@@ -0,0 +1,116 @@
+import pickle
+import unittest
+import numpy as np
+from rpd_tester.rpd_index import RPDIndex
+from rpd_tester.rpd_loader import SkippedArray
+from rpd_tester.perform_comparison import add_specification_test, compare_schedules, handle_unordered_comparisons
+from rpd_tester.schedules import compare_fingerprints, compare_hourly_values, get_hourly_values
+
+
+def make_rpd(schedule_id, hourly_values):
+    return {
+        "id": "Test RPD",
+        "ruleset_model_descriptions": [
+            {
+                "id": "Test RMD",
+                "schedules": [{"id": schedule_id, "hourly_values": hourly_values}],
+                "buildings": [
+                    {
+                        "id": "Building 1",
+                        "building_segments": [
+                            {
+                                "id": "Segment 1",
+                                "zones": [{"id": "Zone 1", "thermostat_cooling_setpoint_schedule": schedule_id}],
+                            }
+                        ],
+                    }
+                ],
+            }
+        ],
+    }
+
+
+class TestSchedules(unittest.TestCase):
+    def test_hourly_values_are_parsed_from_lists_and_skipped_arrays(self):
+        np.testing.assert_array_equal([0.5, 1.0], get_hourly_values({"hourly_values": [0.5, 1]}))
+        np.testing.assert_array_equal([0.5, 1.0], get_hourly_values({"hourly_values": SkippedArray("[0.5,1]")}))
+        self.assertIsNone(get_hourly_values({"hourly_values": ["On", "Off"]}))
+        self.assertIsNone(get_hourly_values(None))
+
+    def test_hourly_values_are_compared_with_tolerance(self):
+        comparison = compare_hourly_values(np.array([1.0, 0.5, 0.0]), np.array([1.0, 0.52, 0.3]), 0.05)
+
+        self.assertEqual(1, comparison.mismatched_hours)
+        self.assertAlmostEqual(0.3, comparison.max_deviation)
+        self.assertAlmostEqual(1.5, comparison.generated_full_load_hours)
+        self.assertAlmostEqual(1.82, comparison.reference_full_load_hours)
+
+    def test_hours_missing_from_one_schedule_are_mismatched(self):
+        comparison = compare_hourly_values(np.ones(8760), np.ones(8784))
+
+        self.assertEqual(24, comparison.mismatched_hours)
+        self.assertEqual(0.0, comparison.max_deviation)
+
+    def test_identical_schedules_are_matched_by_fingerprint(self):
+        generated_index = RPDIndex(make_rpd("Occupancy gen", [0.0] * 4380 + [1.0] * 4380))
+        reference_index = RPDIndex(make_rpd("Occupancy", SkippedArray("[" + ",".join(["0"] * 4380 + ["1"] * 4380) + "]")))
+        reference_index.get_schedule_fingerprint("Occupancy")
+        reference_index = pickle.loads(pickle.dumps(reference_index))
+
+        self.assertEqual(
+            generated_index.get_schedule_fingerprint("Occupancy gen").digest,
+            reference_index.get_schedule_fingerprint("Occupancy").digest,
+        )
+        # The fingerprints kept with the index are used without parsing the reference hourly values again
+        self.assertEqual(0, compare_schedules(generated_index, reference_index, "Occupancy gen", "Occupancy").mismatched_hours)
+        self.assertNotIn("Occupancy", reference_index.schedule_hourly_values)
+
+    def test_schedules_holding_nan_are_not_matched_by_fingerprint(self):
+        generated_index = RPDIndex(make_rpd("Schedule", [float("nan")]))
+
+        self.assertIsNone(
+            compare_fingerprints(generated_index.get_schedule_fingerprint("Schedule"), generated_index.get_schedule_fingerprint("Schedule"))
+        )
+
+    def test_only_the_fingerprinted_schedule_is_parsed(self):
+        rpd = make_rpd("Occupancy", SkippedArray("[0,1]"))
+        rpd["ruleset_model_descriptions"][0]["schedules"].append({"id": "Lighting", "hourly_values": SkippedArray("[1,0]")})
+        rpd_index = RPDIndex(rpd)
+
+        self.assertIsNotNone(rpd_index.get_schedule_fingerprint("Occupancy"))
+        self.assertEqual(["Occupancy"], list(rpd_index.schedule_hourly_values))
+        self.assertEqual(["Occupancy"], list(rpd_index.schedule_fingerprints))
+
+    def test_schedule_references_are_compared_by_hourly_values(self):
+        json_key_path = "$.ruleset_model_descriptions[*].buildings[*].building_segments[*].zones[*].thermostat_cooling_setpoint_schedule"
+        generated_rpd = make_rpd("Cooling gen", [24.0] * 8759 + [26.0])
+        reference_rpd = make_rpd("Cooling", [24.0] * 8760)
+        object_id_map = {"Zone 1": "Zone 1"}
+
+        # Without the hourly values, the reference check and the presence check each record a match
+        for compare_schedule_values, expected_outcomes in ((False, ["MATCH", "MATCH"]), (True, ["DIFFER"])):
+            spec = {"json-key-path": json_key_path, "compare-value": False, "tolerance": 0.5}
+            if compare_schedule_values:
+                spec["compare-schedule-values"] = True
+            specification_test = add_specification_test({"specification_tests": []}, json_key_path)
+
+            _, errors = handle_unordered_comparisons(
+                spec,
+                reference_rpd,
+                generated_rpd,
+                specification_test,
+                object_id_map,
+                generated_index=RPDIndex(generated_rpd),
+                reference_index=RPDIndex(reference_rpd),
+            )
+
+            self.assertEqual(
+                expected_outcomes, [test_result["test_outcome"] for test_result in specification_test["test_results"]]
+            )
+            self.assertEqual(compare_schedule_values, bool(errors))
+
+        self.assertIn("Mismatched hours: 1", specification_test["test_results"][0]["notes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
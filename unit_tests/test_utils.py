@@ -691,3 +691,14 @@ class TestUtilities(unittest.TestCase):
         json_path = '$.ruleset_model_descriptions[0].buildings[0].building_segments[0].zones[*][?(@.id = "Prm Zone 1 (South)")].surfaces[*][?(@.adjacent_to = "EXTERIOR")].optical_properties.absorptance_thermal_exterior'
         result = find_all(json_path, reference_json)
         self.assertEqual(2, len(result))
+
+    def test_compare_values_batch(self):
+        values = [1.05, 1.2, float("inf"), "VAV", True, 3]
+        reference_values = [1.0, 1.0, 1e308, "VAV", 1, 3]
+
+        self.assertEqual(
+            [True, False, False, None, None, True],
+            compare_values_batch(values, reference_values, 0.1),
+        )
+        # Numbers never match without a tolerance
+        self.assertEqual([False, False, False, None, None, False], compare_values_batch(values, reference_values))